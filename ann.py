@@ -0,0 +1,56 @@
+import numpy as np
+
+# Rows scored against the centroids per matrix product.
+_BLOCK_ROWS = 8192
+
+
+def default_nlist(count):
+    """Inverted lists for `count` vectors: ~2*sqrt(n), so each probe scans ~sqrt(n)/2 rows."""
+    return int(np.clip(2 * np.sqrt(count), 16, 4096))
+
+
+def assign_lists(vectors, centroids):
+    """Index of the nearest (highest-cosine) centroid for each unit-norm row."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means: `nlist` unit-norm centroids for the rows of `vectors`."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_lists(vectors, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        sums = np.stack(
+            [np.bincount(labels, weights=vectors[:, dim], minlength=nlist) for dim in range(vectors.shape[1])],
+            axis=1,
+        )
+        # Re-seed empty lists from random rows so every list stays in use
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class InvertedLists:
+    """CSR view of row -> list assignments: the rows of list `l` are order[offsets[l]:offsets[l + 1]]."""
+
+    def __init__(self, labels, nlist):
+        self.order = np.argsort(labels, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))])
+
+    def probe(self, centroids, query, nprobe):
+        """Sorted rows in the `nprobe` lists whose centroids are closest to `query`."""
+        nprobe = min(nprobe, len(centroids))
+        lists = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists.tolist()])
+        rows.sort()
+        return rows
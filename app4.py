@@ -1,73 +1,212 @@
+import asyncio
 import streamlit as st
 import uuid
 from utils4 import *
+import metrics
+import resources
+from open_roles import OPEN_ROLE_SHORTLIST
+from pipeline import STAGES, run_screening
+from screening_client import SCREENING_SERVER_URL, remote_screening
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+metrics.configure_logging(os.getenv("LOG_LEVEL", metrics.LOG_LEVEL))
+# Prometheus scrape target at :METRICS_PORT/metrics; off when unset
+metrics.start_metrics_server(int(os.getenv("METRICS_PORT", metrics.METRICS_PORT)))
+
+# Load the embedding model and Pinecone handle once per process, off the
+# script thread, so the first click doesn't pay for it.
+if os.getenv("WARMUP_ON_START", "").lower() in ("1", "true", "yes"):
+    resources.warmup(background=True)
+
 # Creating session variables
 if 'unique_id' not in st.session_state:
     st.session_state['unique_id'] = ''
 
+def render_metrics_panel():
+    """Show per-stage timings and counters for this process in the sidebar."""
+    counters, stages = metrics.snapshot()
+    with st.sidebar.expander("Pipeline metrics"):
+        if not stages and not counters:
+            st.caption("No screening runs yet.")
+            return
+        st.table([
+            {"Stage": stage, "Calls": values["count"], "Mean (s)": round(values["mean_s"], 3)}
+            for stage, values in sorted(stages.items())
+        ])
+        st.table([{"Metric": name, "Value": value} for name, value in sorted(counters.items())])
+
+def render_open_roles():
+    """Open roles and their shortlists, which new uploads update as they are ingested."""
+    open_roles = resources.get_open_roles()
+    if open_roles is None:
+        return
+    with st.sidebar.expander("Open roles"):
+        with st.form("open_role", clear_on_submit=True):
+            title = st.text_input("Role title")
+            description = st.text_area("Job description")
+            k = st.number_input("Shortlist size", min_value=1, value=OPEN_ROLE_SHORTLIST)
+            if st.form_submit_button("Open role") and title.strip() and description.strip():
+                # Resumes already uploaded this session go straight onto the shortlist
+                unique_id = st.session_state['unique_id']
+                index = resources.get_vector_store(
+                    os.getenv("PINECONE_API_KEY"), os.getenv("PINECONE_ENVIRONMENT"), os.getenv("PINECONE_INDEX_NAME")
+                ) if unique_id else None
+                open_roles.open(title.strip(), description.strip(), create_embeddings_load_data(), int(k),
+                                index=index, namespace=unique_id)
+        roles = open_roles.roles()
+        if not roles:
+            st.caption("No open roles. Resumes uploaded while a role is open are added to its shortlist.")
+        for role in roles:
+            st.markdown(f"**{role.title}**")
+            if not role.embedded_with(resources.MODEL_NAME):
+                st.caption(f"Embedded with {role.model_name}; new uploads are not scored against it.")
+            shortlist = open_roles.shortlist(role.id)
+            if shortlist:
+                st.markdown("\n".join(
+                    f"{idx + 1}. {doc.metadata['name']} ({score:.2f})" for idx, (doc, score) in enumerate(shortlist)
+                ))
+            else:
+                st.caption("No resumes scored yet.")
+            if st.button("Close role", key=f"close-{role.id}"):
+                open_roles.close(role.id)
+                st.rerun()
+
 def main():
     st.set_page_config(page_title="Resume Screening Assistance")
     st.title("HR - Resume Screening Assistance ✋")
     st.subheader("I can help you in the resume screening process")
 
-    job_description = st.text_area("Please paste the 'JOB DESCRIPTION' here...", key="1")
+    job_description = st.text_area(
+        "Please paste the 'JOB DESCRIPTION' here... (separate several roles with a line containing only ---)",
+        key="1"
+    )
+    # Screening against an open role reuses its stored job description vector
+    open_roles = resources.get_open_roles()
+    roles_by_title = {role.title: role for role in open_roles.roles()} if open_roles is not None else {}
+    open_role = None
+    if roles_by_title:
+        choice = st.selectbox("...or screen against an open role", ["None"] + list(roles_by_title))
+        open_role = roles_by_title.get(choice) if choice != "None" else None
     document_count = st.text_input("No. of 'RESUMES' to return", key="2")
     pdf = st.file_uploader("Upload resumes here (PDF only):", type=["pdf"], accept_multiple_files=True)
 
     if st.button("Help me with the analysis"):
-        with st.spinner("Wait for it..."):
-            try:
-                st.session_state['unique_id'] = uuid.uuid4().hex
-                unique_id = st.session_state['unique_id']
-
-                docs = create_docs(pdf, unique_id)
-                st.write(f"Total Resumes Uploaded: {len(docs)}")
-
-                embeddings = create_embeddings_load_data()
-
-                # Get Pinecone credentials
-                pinecone_apikey = os.getenv("PINECONE_API_KEY")
-                pinecone_environment = os.getenv("PINECONE_ENVIRONMENT")
-                pinecone_index_name = os.getenv("PINECONE_INDEX_NAME")
-
-                # Push data to Pinecone
-                push_to_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_name, embeddings, docs)
-
-                # Fetch relevant documents from Pinecone
-                relevant_docs = similar_docs(
-                    query=job_description,
-                    k=int(document_count),
-                    api_key=pinecone_apikey,
-                    environment=pinecone_environment,
-                    index_name=pinecone_index_name,
-                    embeddings=embeddings,
-                    unique_id=unique_id
+        try:
+            st.session_state['unique_id'] = uuid.uuid4().hex
+            unique_id = st.session_state['unique_id']
+
+            roles = [open_role.description] if open_role else split_job_descriptions(job_description)
+            if not roles:
+                st.warning("Please paste a job description, or pick an open role, before starting the analysis.")
+                return
+            if not document_count.strip().isdigit() or int(document_count) <= 0:
+                st.warning("Please enter how many resumes to return as a whole number, e.g. 5.")
+                return
+            if not pdf:
+                st.warning("Please upload at least one resume.")
+                return
+            # A single role can be screened by the shared backend, which owns the model
+            server_url = os.getenv("SCREENING_SERVER_URL", SCREENING_SERVER_URL)
+            remote = bool(server_url) and len(roles) == 1
+            embeddings = None if remote else create_embeddings_load_data()
+            # A role embedded by another model or backend has its description embedded again
+            query_vector = open_role.vector if open_role and open_role.embedded_with(resources.MODEL_NAME) else None
+
+            # Get Pinecone credentials
+            pinecone_apikey = os.getenv("PINECONE_API_KEY")
+            pinecone_environment = os.getenv("PINECONE_ENVIRONMENT")
+            pinecone_index_name = os.getenv("PINECONE_INDEX_NAME")
+
+            # One progress bar per stage, plus a provisional shortlist that
+            # updates as embedding batches land
+            labels = {"parse": "Parsing resumes", "embed": "Embedding", "upsert": "Indexing", "query": "Ranking"}
+            bars = {stage: st.progress(0.0, text=labels[stage]) for stage in STAGES}
+            shortlist = st.empty()
+            relevant_docs = []
+            if remote:
+                events = remote_screening(server_url, pdf, roles[0], int(document_count))
+            else:
+                events = run_screening(pdf, roles[0], int(document_count), unique_id,
+                                       pinecone_apikey, pinecone_environment, pinecone_index_name, embeddings,
+                                       query_vector=query_vector)
+            for event in events:
+                if event.stage == "done":
+                    relevant_docs = event.ranking
+                    st.write(f"Total Resumes Uploaded: {event.total}")
+                    break
+                bars[event.stage].progress(
+                    event.done / event.total if event.total else 1.0,
+                    text=f"{labels[event.stage]}: {event.done}/{event.total}"
                 )
+                if event.ranking:
+                    shortlist.markdown("**Provisional shortlist**\n\n" + "\n".join(
+                        f"{idx + 1}. {doc.metadata['name']} ({score:.2f})"
+                        for idx, (doc, score) in enumerate(event.ranking)
+                    ))
+            shortlist.empty()
+
+            if len(roles) > 1:
+                # Score every role against the session's resumes in one pass
+                per_role, best_fit = similar_docs_multi(
+                    roles, int(document_count), pinecone_apikey, pinecone_environment,
+                    pinecone_index_name, embeddings, unique_id
+                )
+                role_names = [f"Role {idx + 1}: {role.splitlines()[0][:40]}" for idx, role in enumerate(roles)]
+                for tab, ranked in zip(st.tabs(role_names), per_role):
+                    with tab:
+                        for idx, (doc, score) in enumerate(ranked):
+                            st.write(f"{idx + 1}. **{doc.metadata['name']}** - Match Score: {score:.2f}")
+                st.subheader("Best-fit roles per candidate")
+                st.table([
+                    {
+                        "File Name": doc.metadata["name"],
+                        "Best-fit roles": ", ".join(f"{role_names[role]} ({score:.2f})" for role, score in fits)
+                    }
+                    for doc, fits in best_fit
+                ])
+                st.success("Analysis complete! Hope I saved you some time.")
+                return
+
+            if not relevant_docs:
+                st.warning("No relevant resumes were found. Please try a different job description or upload additional resumes.")
+
+
+            summary_slots = []
+            for idx, (doc, score) in enumerate(relevant_docs):
+                st.subheader(f"👉 Resume {idx + 1}")
+                st.write(f"**File Name:** {doc.metadata['name']}")
+                if doc.metadata.get("duplicates"):
+                    st.caption(f"Also uploaded as: {', '.join(doc.metadata['duplicates'])}")
+                st.info(f"**Match Score:** {score:.2f}")
+                if "fused_score" in doc.metadata:
+                    st.caption(f"Ranked by hybrid keyword + semantic score ({doc.metadata['fused_score']:.3f})")
+                if "rerank_score" in doc.metadata:
+                    st.caption(f"Re-ranked by cross-encoder relevance ({doc.metadata['rerank_score']:.2f})")
+                with st.expander("View Summary"):
+                    summary_slots.append(st.empty())
+                    summary_slots[-1].write("Summarising...")
 
-                if not relevant_docs:
-                    st.warning("No relevant resumes were found. Please try a different job description or upload additional resumes.")
-
+            # Summaries arrive concurrently; fill each one in as it lands
+            async def render_summaries():
+                async for idx, summary, error in iter_summaries([doc for doc, _ in relevant_docs]):
+                    if error is not None:
+                        summary_slots[idx].warning(f"Summary unavailable: {error}")
+                    else:
+                        summary_slots[idx].write(f"**Summary:** {summary}")
 
-                for idx, (doc, score) in enumerate(relevant_docs):
-                    st.subheader(f"👉 Resume {idx + 1}")
-                    st.write(f"**File Name:** {doc.metadata['name']}")
-                    st.info(f"**Match Score:** {score:.2f}")
+            asyncio.run(render_summaries())
 
-                with st.expander("View Summary"):
-                    current_doc = doc
-                    summary = get_summary(current_doc)
-                    st.write(f"**Summary:** {summary}")
 
+            st.success("Analysis complete! Hope I saved you some time.")
 
-                st.success("Analysis complete! Hope I saved you some time.")
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
 
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
+    render_open_roles()
+    render_metrics_panel()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,164 @@
+"""Screen a directory of PDF resumes against many job descriptions, without Streamlit.
+
+    python batch_screen.py resumes/ --jobs jobs.jsonl -k 10 -o ranked.jsonl
+
+Job descriptions are read from a .jsonl file ({"id": ..., "text": ...} per
+line) or a text file with descriptions separated by lines containing only
+`---`. Each resume is extracted and embedded once; all job descriptions are
+scored against a batch of resumes with a single matrix product.
+
+The embedding cache takes a single writer process, so batch runs keep their
+own under BATCH_CACHE_DIR and can run while app4 or server.py is up.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from single_writer import use_own_directories
+
+BATCH_CACHE_DIR = os.getenv("BATCH_CACHE_DIR", ".cache/batch")
+use_own_directories("BATCH", BATCH_CACHE_DIR)
+
+import metrics
+import resources
+from chunking import chunk_docs
+from embedding_engine import embed_texts
+from extraction import LocalPDF
+from matching import resume_score_matrix, top_k_per_row
+from sessions import doc_id
+from utils4 import embed_docs, iter_docs, split_job_descriptions
+
+SCREEN_BATCH_SIZE = int(os.getenv("SCREEN_BATCH_SIZE", "256"))
+
+
+def find_pdfs(patterns):
+    """Expand directories (recursively) and glob patterns into sorted PDF paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.pdf")
+        paths.update(path for path in glob.glob(pattern, recursive=True) if path.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def load_job_descriptions(path):
+    """Return a list of (job_id, text) pairs from a .jsonl or `---`-separated text file."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".jsonl"):
+        jobs = []
+        for line_no, line in enumerate(content.splitlines(), 1):
+            if line.strip():
+                record = json.loads(line)
+                jobs.append((str(record.get("id", line_no)), record["text"]))
+        return jobs
+    return [(str(idx + 1), text) for idx, text in enumerate(split_job_descriptions(content))]
+
+
+def screen_resumes(pdf_paths, jobs, k=10, embeddings=None, batch_size=SCREEN_BATCH_SIZE, stats=None):
+    """Rank resumes for each job description.
+
+    Resumes are processed `batch_size` at a time, so memory stays bounded by
+    the batch plus the running top-k. Each batch is also merged into the
+    shortlists of any open roles. Returns {job_id: [(name, path, score), ...]}.
+    `stats`, if given, is filled with resume/chunk counts.
+    """
+    embeddings = embeddings or resources.get_embeddings()
+    open_roles = resources.get_open_roles()
+    job_ids = [job_id for job_id, _ in jobs]
+    job_vectors = embed_texts(embeddings, [text for _, text in jobs])
+
+    resumes = []  # (name, path) per screened resume; columns of the running top-k point here
+    kept_scores = np.empty((len(jobs), 0), dtype=np.float32)
+    kept_refs = np.empty((len(jobs), 0), dtype=np.int64)
+    chunk_count = 0
+
+    for start in range(0, len(pdf_paths), batch_size):
+        files = [LocalPDF(path) for path in pdf_paths[start:start + batch_size]]
+        parsed = sorted(iter_docs(files, unique_id="batch"), key=lambda item: item[0])
+        if not parsed:
+            continue
+        docs = [doc for _, doc in parsed]
+        ids = [doc_id(doc) for doc in docs]
+        chunks = chunk_docs(docs, ids)
+        chunk_starts = [idx for idx, chunk in enumerate(chunks) if chunk.metadata["chunk"] == 0]
+        chunk_count += len(chunks)
+
+        vectors = embed_docs(embeddings, chunks)
+        scores = resume_score_matrix(job_vectors, vectors, chunk_starts)
+        if open_roles is not None:
+            open_roles.score(docs, ids, chunks, vectors, embeddings)
+        refs = np.arange(len(resumes), len(resumes) + len(docs))
+        resumes.extend((files[position].name, files[position].path) for position, _ in parsed)
+
+        # Merge this batch into each job's running top-k
+        combined_scores = np.hstack([kept_scores, scores])
+        combined_refs = np.hstack([kept_refs, np.broadcast_to(refs, scores.shape)])
+        top, kept_scores = top_k_per_row(combined_scores, k)
+        kept_refs = np.take_along_axis(combined_refs, top, axis=1)
+
+    if stats is not None:
+        stats.update(resumes=len(resumes), chunks=chunk_count, jobs=len(jobs))
+    return {
+        job_id: [(*resumes[ref], float(score)) for ref, score in zip(refs.tolist(), scores.tolist())]
+        for job_id, refs, scores in zip(job_ids, kept_refs, kept_scores)
+    }
+
+
+def write_results(results, output, fmt=None):
+    """Write ranked results as JSONL or CSV (picked from the extension if `fmt` is None)."""
+    fmt = fmt or ("csv" if output.endswith(".csv") else "jsonl")
+    rows = [
+        {"job_id": job_id, "rank": rank, "resume": name, "path": path, "score": round(score, 6)}
+        for job_id, ranked in results.items()
+        for rank, (name, path, score) in enumerate(ranked, 1)
+    ]
+    stream = open(output, "w", newline="", encoding="utf-8") if output != "-" else nullcontext(sys.stdout)
+    with stream as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=["job_id", "rank", "resume", "path", "score"])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("resumes", nargs="+", help="directories or glob patterns of PDF resumes")
+    parser.add_argument("--jobs", required=True, help=".jsonl or ---separated text file of job descriptions")
+    parser.add_argument("-k", type=int, default=10, help="resumes to keep per job description")
+    parser.add_argument("-o", "--output", default="-", help="output path (.jsonl or .csv); - for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="override the output format")
+    parser.add_argument("--batch-size", type=int, default=SCREEN_BATCH_SIZE, help="resumes per scoring batch")
+    args = parser.parse_args(argv)
+    metrics.configure_logging()
+
+    pdf_paths = find_pdfs(args.resumes)
+    jobs = load_job_descriptions(args.jobs)
+    if not pdf_paths or not jobs:
+        parser.error("no PDF resumes or job descriptions found")
+
+    started = time.perf_counter()
+    stats = {}
+    results = screen_resumes(pdf_paths, jobs, k=args.k, batch_size=args.batch_size, stats=stats)
+    write_results(results, args.output, args.format)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Screened {stats['resumes']} resumes ({stats['chunks']} chunks) against {stats['jobs']} "
+        f"job descriptions in {elapsed:.1f}s ({stats['resumes'] / elapsed:.1f} resumes/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
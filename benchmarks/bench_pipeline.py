@@ -0,0 +1,242 @@
+"""Offline benchmark for the extraction -> embedding -> retrieval -> summary pipeline.
+
+    python benchmarks/bench_pipeline.py --sizes 50,200 --pages 1,3 -o bench_output.json
+    python benchmarks/bench_pipeline.py --compare bench_output.json   # exit 1 on regression
+
+Runs fully offline on CPU: resumes are synthetic PDFs, LocalIndex stands in
+for Pinecone, and summaries go to the stub OpenAI server in stub_openai.py.
+The MiniLM model must already be in the local Hugging Face cache; pass
+`--embeddings hashing` to use a dependency-free stand-in instead.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HashingEmbeddings:
+    """Deterministic bag-of-words hashing embedder, for runs without the MiniLM weights."""
+
+    model_name = "hashing-384"
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
+
+
+class _Upload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def _configure_environment(workdir):
+    # Repo modules read their settings at import time, so this runs first.
+    os.environ.update({
+        "VECTOR_STORE": "local",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "index"),
+        "DOC_STORE_PATH": os.path.join(workdir, "documents.sqlite3"),
+        "EMBEDDING_CACHE_DIR": "",
+        "PAGE_CACHE_PATH": "",
+        "OPEN_ROLES_PATH": "",
+        "SESSION_GC_INTERVAL": "1e12",
+        "OPENAI_API_KEY": "stub",
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+    })
+    sys.path.insert(0, ROOT)
+
+
+def _start_stub_llm():
+    from werkzeug.serving import make_server
+
+    import stub_openai
+
+    server = make_server("127.0.0.1", 0, stub_openai.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    return server
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and of its (extraction) children."""
+    to_mb = 1 / 1024 if sys.platform != "darwin" else 1 / 2**20
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * to_mb, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * to_mb, 1),
+    }
+
+
+def _stage(items, elapsed, latencies, unit):
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000
+    return {
+        "items": items,
+        "unit": unit,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_per_s": round(items / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3) if len(latencies_ms) else None,
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3) if len(latencies_ms) else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_config(count, pages, embeddings, queries, summaries, seed):
+    """Benchmark every stage for `count` synthetic resumes of `pages` pages each."""
+    from synthetic_resumes import generate_resumes, job_descriptions
+    from utils4 import create_docs, get_pdf_text, get_summary, push_to_pinecone, similar_docs
+
+    resumes = generate_resumes(count, pages=pages, seed=seed)
+    uploads = [_Upload(name, data) for name, data, _ in resumes]
+    session = f"bench-{count}x{pages}-{time.time_ns()}"
+    stages = {}
+
+    latencies = []
+    started = time.perf_counter()
+    for upload in uploads:
+        t0 = time.perf_counter()
+        get_pdf_text(io.BytesIO(upload.getvalue()))
+        latencies.append(time.perf_counter() - t0)
+    stages["get_pdf_text"] = _stage(count * pages, time.perf_counter() - started, latencies, "pages")
+
+    started = time.perf_counter()
+    docs = create_docs(uploads, session)
+    stages["create_docs"] = _stage(len(docs), time.perf_counter() - started, [], "resumes")
+
+    # push_to_pinecone reports embed batches, then upsert acknowledgements
+    marks = {"embed": [], "upsert": []}
+
+    def on_progress(stage, done, total, **details):
+        marks[stage].append((time.perf_counter(), done))
+
+    started = time.perf_counter()
+    push_to_pinecone(None, None, "bench", embeddings, docs, on_progress=on_progress)
+    finished = time.perf_counter()
+    embed_end = marks["embed"][-1][0] if marks["embed"] else started
+    for stage, begin, end in (("embed", started, embed_end), ("upsert", embed_end, finished)):
+        times = [begin] + [t for t, _ in marks[stage]]
+        chunks = marks[stage][-1][1] if marks[stage] else 0
+        stages[stage] = _stage(chunks, end - begin, np.diff(times), "chunks")
+
+    latencies = []
+    jds = job_descriptions(queries, seed=seed)
+    started = time.perf_counter()
+    for jd in jds:
+        t0 = time.perf_counter()
+        similar_docs(jd, 5, None, None, "bench", embeddings, session)
+        latencies.append(time.perf_counter() - t0)
+    stages["similar_docs"] = _stage(len(jds), time.perf_counter() - started, latencies, "queries")
+
+    latencies = []
+    started = time.perf_counter()
+    for doc in docs[:summaries]:
+        t0 = time.perf_counter()
+        get_summary(doc)
+        latencies.append(time.perf_counter() - t0)
+    stages["get_summary"] = _stage(len(latencies), time.perf_counter() - started, latencies, "resumes")
+
+    return {"config": f"{count}x{pages}", "resumes": count, "pages": pages, "stages": stages}
+
+
+def compare(baseline, current, tolerance):
+    """Print per-stage changes; return True if any stage regressed beyond `tolerance`."""
+    regressed = False
+    previous = {run["config"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        before = previous.get(run["config"])
+        if before is None:
+            continue
+        for stage, now in run["stages"].items():
+            old = before["stages"].get(stage)
+            if not old or not old.get("throughput_per_s") or not now.get("throughput_per_s"):
+                continue
+            change = now["throughput_per_s"] / old["throughput_per_s"] - 1
+            flag = ""
+            if change < -tolerance:
+                flag, regressed = "  REGRESSION", True
+            print(f"{run['config']:>10} {stage:<14} {old['throughput_per_s']:>10} -> "
+                  f"{now['throughput_per_s']:>10} {now['unit']}/s ({change:+.1%}){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,200", help="comma-separated resume counts")
+    parser.add_argument("--pages", default="1,3", help="comma-separated pages per resume")
+    parser.add_argument("--queries", type=int, default=20, help="similar_docs calls per config")
+    parser.add_argument("--summaries", type=int, default=5, help="get_summary calls per config")
+    parser.add_argument("--embeddings", choices=["minilm", "hashing"], default="minilm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench_output.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed throughput drop before flagging")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="resume-bench-")
+    _configure_environment(workdir)
+    _start_stub_llm()
+
+    import resources
+
+    embeddings = resources.get_embeddings() if args.embeddings == "minilm" else HashingEmbeddings()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embeddings": getattr(embeddings, "model_name", args.embeddings),
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+    for count in (int(size) for size in args.sizes.split(",")):
+        for pages in (int(page) for page in args.pages.split(",")):
+            run = run_config(count, pages, embeddings, args.queries, args.summaries, args.seed)
+            results["runs"].append(run)
+            summary = ", ".join(
+                f"{stage} {stats['throughput_per_s']}/s p95 {stats['p95_ms']}ms"
+                for stage, stats in run["stages"].items()
+            )
+            print(f"[{run['config']}] {summary}", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if baseline is not None and compare(baseline, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare an optimized embedding backend against fp32 torch on the same texts.
+
+    python benchmarks/embedding_parity.py --backend int8
+    python benchmarks/embedding_parity.py --backend onnx --texts 500 --min-cosine 0.99
+
+Embeds synthetic resume chunks and job descriptions with both backends and
+reports cosine drift from the fp32 vectors, top-k ranking overlap and
+throughput. Exits 1 if the worst-case cosine falls below --min-cosine.
+The model must already be in the local Hugging Face cache.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _texts(count, seed):
+    from synthetic_resumes import job_descriptions, resume_text
+
+    from chunking import chunk_text
+
+    rng = random.Random(seed)
+    chunks = []
+    while len(chunks) < count:
+        chunks.extend(chunk_text("\n".join(resume_text(rng, 350, 1))))
+    return chunks[:count], job_descriptions(max(1, count // 20), seed=seed)
+
+
+def _timed_embed(embeddings, texts):
+    from embedding_engine import embed_texts
+
+    embed_texts(embeddings, texts[:8])  # first call pays for lazy setup
+    started = time.perf_counter()
+    vectors = embed_texts(embeddings, texts)
+    return vectors, time.perf_counter() - started
+
+
+def _top_k_overlap(reference, candidate, queries_ref, queries_cand, k):
+    ref_top = np.argsort(-(queries_ref @ reference.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(queries_cand @ candidate.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top.tolist(), cand_top.tolist())]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["int8", "onnx"], default="int8")
+    parser.add_argument("--texts", type=int, default=200, help="resume chunks to embed")
+    parser.add_argument("--threads", type=int, default=0, help="inference threads; 0 uses every available core")
+    parser.add_argument("-k", type=int, default=10, help="ranking depth for the overlap check")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    sys.path.insert(0, ROOT)
+    from embedding_engine import cosine_drift, load_embeddings
+    from resources import MODEL_NAME
+
+    texts, queries = _texts(args.texts, args.seed)
+    reference = load_embeddings(MODEL_NAME, "torch", args.threads)
+    candidate = load_embeddings(MODEL_NAME, args.backend, args.threads)
+
+    ref_vectors, ref_elapsed = _timed_embed(reference, texts)
+    cand_vectors, cand_elapsed = _timed_embed(candidate, texts)
+    ref_queries, _ = _timed_embed(reference, queries)
+    cand_queries, _ = _timed_embed(candidate, queries)
+
+    report = {
+        "backend": args.backend,
+        "drift": cosine_drift(ref_vectors, cand_vectors),
+        "query_drift": cosine_drift(ref_queries, cand_queries),
+        f"top{args.k}_overlap": _top_k_overlap(ref_vectors, cand_vectors, ref_queries, cand_queries, args.k),
+        "torch_texts_per_s": round(len(texts) / ref_elapsed, 1),
+        f"{args.backend}_texts_per_s": round(len(texts) / cand_elapsed, 1),
+        "speedup": round(ref_elapsed / cand_elapsed, 2),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if min(report["drift"]["min_cosine"], report["query_drift"]["min_cosine"]) < args.min_cosine:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
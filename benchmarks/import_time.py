@@ -0,0 +1,90 @@
+"""Report the cold-start import cost of the app's modules.
+
+    python benchmarks/import_time.py                      # utils4, pipeline, resources
+    python benchmarks/import_time.py --modules app4 --top 25 -o import_time.json
+    python benchmarks/import_time.py --max-seconds 1.5    # exit 1 if slower
+
+Imports the modules in a fresh interpreter under `python -X importtime`,
+then prints the total, the slowest top-level imports, and whether any of
+the heavy libraries that should load lazily were pulled in at import time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only load when the stage needing them runs.
+HEAVY_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "langchain.chains",
+    "langchain_community.llms",
+    "langchain_openai",
+    "openai",
+    "pinecone",
+    "pypdf",
+)
+
+
+def measure(modules):
+    """Import `modules` in a fresh interpreter; return (per-module timings, heavy modules loaded)."""
+    code = (
+        "import json, sys\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + f"print(json.dumps([m for m in {list(HEAVY_MODULES)!r} if m in sys.modules]))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(proc.returncode)
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append({
+            "module": name.strip(),
+            "depth": depth,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return timings, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", default="utils4,pipeline,resources", help="comma-separated modules to import")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    parser.add_argument("--max-seconds", type=float, help="exit 1 if the total import time exceeds this")
+    args = parser.parse_args(argv)
+
+    timings, heavy = measure(args.modules.split(","))
+    top_level = [timing for timing in timings if timing["depth"] == 0]
+    total_s = sum(timing["cumulative_ms"] for timing in top_level) / 1000
+
+    print(f"Total import time: {total_s:.3f}s")
+    for timing in sorted(top_level, key=lambda timing: -timing["cumulative_ms"])[: args.top]:
+        print(f"{timing['cumulative_ms']:>10.1f} ms  {timing['module']}")
+    print("Heavy modules loaded at import: " + (", ".join(heavy) if heavy else "none"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"modules": args.modules, "total_s": total_s, "heavy_loaded": heavy,
+                       "imports": top_level}, f, indent=2)
+
+    if args.max_seconds is not None and total_s > args.max_seconds:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare peak RSS of streaming and all-at-once ingest as uploads grow.
+
+    python benchmarks/ingest_memory.py --sizes 200,1000,4000 --embeddings hashing
+    python benchmarks/ingest_memory.py --sizes 2000 --memory-mb 64,256
+
+Writes synthetic resume PDFs to a temporary directory, then ingests each
+size in a fresh subprocess, once through ingest.stream_ingest (per
+--memory-mb ceiling) and once through create_docs + push_to_pinecone.
+Reports the process's peak RSS. The streaming path's working set is flat
+in the number of resumes; what growth remains comes from LocalIndex, which
+keeps each namespace's codes, ids and metadata in memory.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _write_pdfs(directory, count, pages, seed):
+    sys.path.insert(0, HERE)
+    from synthetic_resumes import generate_resumes
+
+    paths = []
+    for name, data, _ in generate_resumes(count, pages=pages, seed=seed):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def _run(args):
+    """Child process: ingest the PDFs listed in args.files and print one JSON result line."""
+    workdir = tempfile.mkdtemp(prefix="ingest-memory-")
+    sys.path.insert(0, HERE)
+    import bench_pipeline
+
+    bench_pipeline._configure_environment(workdir)
+    os.environ["LEXICAL_INDEX_DIR"] = os.path.join(workdir, "lexical")
+
+    import resources
+    from extraction import LocalPDF
+
+    embeddings = resources.get_embeddings() if args.embeddings == "minilm" else bench_pipeline.HashingEmbeddings()
+    with open(args.files) as f:
+        files = [LocalPDF(line.strip()) for line in f if line.strip()]
+
+    started = time.perf_counter()
+    if args.mode == "stream":
+        from ingest import stream_ingest
+
+        vectors = stream_ingest(files, "bench", None, None, "bench", embeddings, memory_mb=args.memory_mb)
+    else:
+        from utils4 import create_docs, push_to_pinecone
+
+        push_to_pinecone(None, None, "bench", embeddings, create_docs(files, "bench"))
+        vectors = len(resources.get_vector_store(None, None, "bench")._namespace("bench"))
+    elapsed = time.perf_counter() - started
+    to_mb = 1 / 1024 if sys.platform != "darwin" else 1 / 2**20
+    print(json.dumps({
+        "vectors": int(vectors),
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * to_mb, 1),
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="200,1000", help="comma-separated resume counts")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--memory-mb", default="256", help="comma-separated INGEST_MEMORY_MB values to try")
+    parser.add_argument("--embeddings", choices=["minilm", "hashing"], default="minilm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    parser.add_argument("--mode", choices=["stream", "batch"], help=argparse.SUPPRESS)
+    parser.add_argument("--files", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.mode:
+        args.memory_mb = float(args.memory_mb)
+        return _run(args)
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix="ingest-pdfs-") as directory:
+        for count in (int(size) for size in args.sizes.split(",")):
+            listing = os.path.join(directory, f"files-{count}.txt")
+            pdf_dir = os.path.join(directory, str(count))
+            os.makedirs(pdf_dir)
+            with open(listing, "w") as f:
+                f.write("\n".join(_write_pdfs(pdf_dir, count, args.pages, args.seed)))
+            runs = [("stream", memory_mb) for memory_mb in args.memory_mb.split(",")] + [("batch", "0")]
+            for mode, memory_mb in runs:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--mode", mode, "--files", listing,
+                     "--memory-mb", memory_mb, "--embeddings", args.embeddings],
+                    check=True, capture_output=True, text=True, cwd=ROOT,
+                ).stdout
+                row = {"resumes": count, "mode": mode, "memory_mb": float(memory_mb) if mode == "stream" else None}
+                row.update(json.loads(output.strip().splitlines()[-1]))
+                report.append(row)
+                print(json.dumps(row))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
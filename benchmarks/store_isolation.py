@@ -0,0 +1,123 @@
+"""Check that batch_screen.py runs while app4 holds its single-writer stores.
+
+    python benchmarks/store_isolation.py --resumes 20 --embeddings hashing
+
+In a temporary working directory, one subprocess opens the stores the way
+app4 does (embedding cache, local index and BM25 index on their `.cache`
+defaults) and keeps them open. A second app process must then be refused
+with StoreInUse, and a batch_screen.screen_resumes run must still finish.
+Exits non-zero if either expectation fails.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Cleared in the children, so every store sits on its default directory.
+_STORE_SETTINGS = (
+    "EMBEDDING_CACHE_DIR", "LOCAL_INDEX_DIR", "LEXICAL_INDEX_DIR", "DOC_STORE_PATH", "PAGE_CACHE_PATH",
+    "OPEN_ROLES_PATH", "BATCH_CACHE_DIR", "BATCH_EMBEDDING_CACHE_DIR", "BATCH_LOCAL_INDEX_DIR",
+    "BATCH_LEXICAL_INDEX_DIR",
+)
+
+
+def _open_app_stores():
+    """Child process: open the stores as app4 does, report, then hold them until stdin closes."""
+    sys.path.insert(0, ROOT)
+    import resources
+    from single_writer import StoreInUse
+
+    try:
+        resources.get_embedding_cache()
+        resources.get_lexical_index()
+        resources.get_vector_store(None, None, "isolation")
+    except StoreInUse as e:
+        print(json.dumps({"refused": str(e)}), flush=True)
+        return
+    print(json.dumps({"refused": None}), flush=True)
+    sys.stdin.read()
+
+
+def _screen(args):
+    """Child process: screen the PDFs in args.files and print one JSON result line."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import batch_screen  # first, so it picks its own store directories
+
+    from bench_pipeline import HashingEmbeddings
+    from synthetic_resumes import job_descriptions
+
+    with open(args.files) as f:
+        paths = [line.strip() for line in f if line.strip()]
+    embeddings = HashingEmbeddings() if args.embeddings == "hashing" else None
+    jobs = [(str(idx), text) for idx, text in enumerate(job_descriptions(3))]
+    stats = {}
+    batch_screen.screen_resumes(paths, jobs, k=5, embeddings=embeddings, stats=stats)
+    print(json.dumps(stats))
+
+
+def _child(mode, args, workdir, **kwargs):
+    env = {name: value for name, value in os.environ.items() if name not in _STORE_SETTINGS}
+    env.update(VECTOR_STORE="local", HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    command = [sys.executable, os.path.abspath(__file__), "--mode", mode, "--embeddings", args.embeddings]
+    if args.files:
+        command += ["--files", args.files]
+    return subprocess.Popen(command, cwd=workdir, env=env, text=True, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resumes", type=int, default=20)
+    parser.add_argument("--embeddings", choices=["minilm", "hashing"], default="minilm")
+    parser.add_argument("--mode", choices=["app", "batch"], help=argparse.SUPPRESS)
+    parser.add_argument("--files", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.mode == "app":
+        return _open_app_stores()
+    if args.mode == "batch":
+        return _screen(args)
+
+    sys.path.insert(0, HERE)
+    from ingest_memory import _write_pdfs
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="store-isolation-") as workdir:
+        args.files = os.path.join(workdir, "files.txt")
+        pdf_dir = os.path.join(workdir, "pdfs")
+        os.makedirs(pdf_dir)
+        with open(args.files, "w") as f:
+            f.write("\n".join(_write_pdfs(pdf_dir, args.resumes, 1, 0)))
+
+        app = _child("app", args, workdir, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            if json.loads(app.stdout.readline())["refused"]:
+                parser.error("the app process could not open its stores")
+            second = _child("app", args, workdir, stdout=subprocess.PIPE)
+            refused = json.loads(second.communicate()[0].strip().splitlines()[-1])["refused"]
+            print(f"second app process refused: {bool(refused)}")
+            if not refused:
+                failures.append("a second app process opened the same stores")
+
+            batch = _child("batch", args, workdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, errors = batch.communicate()
+            if batch.returncode:
+                print(errors, file=sys.stderr)
+                failures.append("batch_screen failed while the app was up")
+            else:
+                print(f"batch_screen while the app is up: {output.strip().splitlines()[-1]}")
+        finally:
+            app.stdin.close()
+            app.wait()
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
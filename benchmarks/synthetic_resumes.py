@@ -0,0 +1,93 @@
+import random
+
+_SKILLS = (
+    "Python", "Java", "SQL", "Django", "Flask", "React", "TypeScript", "Kubernetes",
+    "Docker", "AWS", "GCP", "Terraform", "PostgreSQL", "Spark", "Airflow", "Pandas",
+    "Excel", "Salesforce", "SEO", "Figma", "Tableau", "Go", "Rust", "C++",
+)
+_ROLES = (
+    "Software Engineer", "Data Analyst", "Marketing Assistant", "DevOps Engineer",
+    "Product Designer", "Sales Associate", "Data Engineer", "Backend Developer",
+)
+_FILLER = (
+    "led", "built", "designed", "migrated", "improved", "reduced", "launched", "owned",
+    "the", "a", "team", "service", "pipeline", "platform", "latency", "revenue",
+    "customers", "reporting", "dashboards", "workflow", "by", "with", "across", "for",
+)
+_SECTIONS = ("SUMMARY", "EXPERIENCE", "EDUCATION", "SKILLS", "PROJECTS", "CERTIFICATIONS")
+
+LINE_WIDTH = 90
+LINES_PER_PAGE = 55
+
+
+def resume_text(rng, words_per_page, pages):
+    """Random but plausible resume text, split into one string per page."""
+    name = f"Candidate {rng.randrange(10**6):06d}"
+    role = rng.choice(_ROLES)
+    page_texts = []
+    for page in range(pages):
+        lines = [f"{name} - {role}"] if page == 0 else []
+        words = 0
+        while words < words_per_page:
+            lines.append(rng.choice(_SECTIONS))
+            for _ in range(rng.randint(3, 8)):
+                line = " ".join(
+                    rng.choice(_SKILLS) if rng.random() < 0.2 else rng.choice(_FILLER)
+                    for _ in range(rng.randint(8, 14))
+                )
+                lines.append(line[:LINE_WIDTH])
+                words += len(line.split())
+        page_texts.append("\n".join(lines[:LINES_PER_PAGE]))
+    return page_texts
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(page_texts):
+    """Build a minimal text-only PDF (Helvetica, one content stream per page)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for idx, text in enumerate(page_texts):
+        page_id, content_id = 4 + 2 * idx, 5 + 2 * idx
+        kids.append(f"{page_id} 0 R")
+        body = "BT /F1 9 Tf 40 760 Td 12 TL " + " ".join(
+            f"({_escape(line)}) Tj T*" for line in text.splitlines()
+        ) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream".encode("latin-1"))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(page_texts)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def generate_resumes(count, pages=1, words_per_page=350, seed=0):
+    """Return `count` (name, pdf_bytes, pages) tuples, reproducible for a given seed."""
+    rng = random.Random(seed)
+    return [
+        (f"resume_{idx:05d}.pdf", make_pdf(resume_text(rng, words_per_page, pages)), pages)
+        for idx in range(count)
+    ]
+
+
+def job_descriptions(count, seed=0):
+    """Short synthetic job descriptions drawing on the same skill vocabulary."""
+    rng = random.Random(seed + 1)
+    return [
+        f"{rng.choice(_ROLES)} with experience in " + ", ".join(rng.sample(_SKILLS, 5))
+        for _ in range(count)
+    ]
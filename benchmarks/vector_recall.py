@@ -0,0 +1,133 @@
+"""Measure recall@k and footprint of LocalIndex's compressed storage formats.
+
+    python benchmarks/vector_recall.py --vectors 100000 -k 10
+    python benchmarks/vector_recall.py --precisions float16,int8 --rerank 0,2,4
+    python benchmarks/vector_recall.py --vectors 200000 --precisions int8 --nprobe 8,32,128
+
+Builds one LocalIndex namespace per precision from the same clustered
+unit vectors (resume chunks cluster by role and skill), reopens it as after
+a restart and overwrites --writes rows (so copy-on-write has happened),
+then compares each query's top k against exact float32 search. Reports
+recall@k, mean query latency, bytes per vector held in RAM (every array
+not backed by a file, the float32 re-rank rows included if they were) and
+the disk footprint relative to float32. With
+--nprobe, each index is built with its IVF lists and queried at every
+listed nprobe (0 scans every row).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def clustered_vectors(count, dimension=384, clusters=64, spread=0.6, seed=0):
+    """Unit vectors drawn around `clusters` random centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=count)] + spread * rng.standard_normal(
+        (count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _build(index, vectors, batch=1000):
+    for start in range(0, len(vectors), batch):
+        index.upsert([
+            {"id": f"v{row}", "values": vector}
+            for row, vector in enumerate(vectors[start:start + batch], start)
+        ])
+    index.flush()
+
+
+def _ram_bytes(ns):
+    """Bytes of the namespace's arrays that live in RAM rather than in a mapped file."""
+    arrays = (ns.vectors, ns.scales, ns.full, ns.assign, ns.centroids)
+    return sum(array.nbytes for array in arrays if array is not None and not isinstance(array, np.memmap))
+
+
+def _disk_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--precisions", default="float32,float16,int8")
+    parser.add_argument("--rerank", default="0,4", help="comma-separated LOCAL_INDEX_RERANK values to try")
+    parser.add_argument("--nprobe", default="0", help="comma-separated IVF lists to scan; 0 is exact")
+    parser.add_argument("--writes", type=int, default=100, help="rows overwritten after reopening")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from vector_store import LocalIndex
+
+    vectors = clustered_vectors(args.vectors, seed=args.seed)
+    queries = clustered_vectors(args.queries, seed=args.seed + 1)
+    workdir = tempfile.mkdtemp(prefix="vector-recall-")
+    try:
+        exact = LocalIndex(os.path.join(workdir, "float32"), precision="float32", ann_min_vectors=2**62)
+        _build(exact, vectors)
+        truth = [
+            {match["id"] for match in exact.query(query, args.k)["matches"]}
+            for query in queries
+        ]
+        float32_disk = _disk_bytes(exact.path)
+        float32_ram = len(vectors) * vectors.shape[1] * 4
+        writes = vectors[:args.writes]
+
+        nprobes = [int(value) for value in args.nprobe.split(",")]
+        ann_min_vectors = 1 if any(nprobes) else 2**62
+        report = []
+        for precision in args.precisions.split(","):
+            reranks = [0] if precision == "float32" else [int(value) for value in args.rerank.split(",")]
+            for rerank in reranks:
+                # rerank 0 also drops the float32 rows from disk
+                index = LocalIndex(os.path.join(workdir, f"{precision}-{rerank}"), precision=precision,
+                                   rerank=rerank, ann_min_vectors=ann_min_vectors)
+                _build(index, vectors)
+                # memory-mapped, as after a restart; then written to, which copies what it must into RAM
+                reopened = LocalIndex(index.path, rerank=rerank, ann_min_vectors=ann_min_vectors)
+                if len(writes):
+                    reopened.upsert([{"id": f"v{row}", "values": vector} for row, vector in enumerate(writes)])
+                    reopened.flush()
+                ns = reopened._namespace("")
+                ram_bytes = _ram_bytes(ns)
+                for nprobe in nprobes:
+                    started = time.perf_counter()
+                    found = [
+                        {match["id"] for match in reopened.query(query, args.k, nprobe=nprobe)["matches"]}
+                        for query in queries
+                    ]
+                    elapsed = time.perf_counter() - started
+                    report.append({
+                        "precision": precision,
+                        "rerank": rerank,
+                        "nprobe": nprobe,
+                        f"recall@{args.k}": round(
+                            float(np.mean([len(a & b) / args.k for a, b in zip(found, truth)])), 4),
+                        "query_ms": round(elapsed / len(queries) * 1000, 3),
+                        "ram_bytes_per_vector": round(ram_bytes / len(vectors), 1),
+                        "ram_reduction": round(float32_ram / ram_bytes, 2) if ram_bytes else None,
+                        "disk_vs_float32": round(_disk_bytes(index.path) / float32_disk, 2),
+                    })
+                    print(json.dumps(report[-1]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+from langchain_core.documents import Document
+
+# MiniLM truncates at 256 word pieces; leave room for special tokens.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))
+RESUME_AGGREGATE = os.getenv("RESUME_AGGREGATE", "max")
+AGGREGATE_TOP_N = int(os.getenv("AGGREGATE_TOP_N", "3"))
+# Chunks fetched per requested resume before aggregating.
+CHUNK_OVERSAMPLE = int(os.getenv("CHUNK_OVERSAMPLE", "8"))
+
+# Word pieces per whitespace word, matching embedding_engine.estimate_tokens.
+_TOKENS_PER_WORD = 1.3
+
+_SECTION_WORDS = (
+    "summary", "profile", "objective", "experience", "employment", "work history",
+    "education", "skills", "technical skills", "projects", "certifications",
+    "certificates", "licenses", "publications", "awards", "languages",
+    "volunteer", "interests", "references", "achievements", "training",
+)
+_HEADING = re.compile(
+    r"^\s*(?:(?:professional|work|relevant|core|key)\s+)?(?:%s)\s*:?\s*$" % "|".join(_SECTION_WORDS),
+    re.IGNORECASE,
+)
+
+
+def _is_heading(line):
+    stripped = line.strip()
+    if not stripped or len(stripped.split()) > 5:
+        return False
+    return bool(_HEADING.match(stripped)) or (stripped.isupper() and any(c.isalpha() for c in stripped))
+
+
+def split_sections(text):
+    """Split resume text into (heading, body) sections on heading-like lines.
+
+    A heading with no body, such as an all-caps name line right above
+    "Summary", is kept as a section of its own so its text still reaches
+    the chunks.
+    """
+    sections, heading, lines = [], "", []
+    for line in text.splitlines():
+        if _is_heading(line):
+            if heading or any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines)))
+            heading, lines = line.strip().rstrip(":"), []
+        else:
+            lines.append(line)
+    if heading or any(l.strip() for l in lines) or not sections:
+        sections.append((heading, "\n".join(lines)))
+    return sections
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """Split text into section-aware passages of at most ~`max_tokens` word pieces.
+
+    Short consecutive sections are packed together; long ones are windowed
+    with `overlap` tokens shared between neighbours, each window prefixed
+    with its section heading.
+    """
+    max_words = max(1, int(max_tokens / _TOKENS_PER_WORD))
+    step = max(1, max_words - int(overlap / _TOKENS_PER_WORD))
+    chunks, pending = [], []
+
+    def flush_pending():
+        if pending:
+            chunks.append(" ".join(pending))
+            pending.clear()
+
+    for heading, body in split_sections(text):
+        words = ([heading] if heading else []) + body.split()
+        if len(words) <= max_words:
+            if len(pending) + len(words) > max_words:
+                flush_pending()
+            pending.extend(words)
+            continue
+        flush_pending()
+        body_words = body.split()
+        budget = max_words - (len(heading.split()) if heading else 0)
+        stride = max(1, min(step, budget))
+        for start in range(0, len(body_words), stride):
+            window = body_words[start:start + budget]
+            chunks.append(" ".join(([heading] if heading else []) + window))
+            if start + budget >= len(body_words):
+                break
+    flush_pending()
+    return chunks or [""]
+
+
+def chunk_docs(docs, doc_ids, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """Split each resume into chunk Documents tagged with their parent `doc_id`."""
+    chunks = []
+    for doc, doc_id in zip(docs, doc_ids):
+        for idx, text in enumerate(chunk_text(doc.page_content, max_tokens, overlap)):
+            chunks.append(Document(
+                page_content=text,
+                metadata={
+                    **doc.metadata,
+                    "doc_id": doc_id,
+                    "chunk": idx,
+                    "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()
+                }
+            ))
+    return chunks
+
+
+def aggregate_scores(group_ids, scores, method=RESUME_AGGREGATE, top_n=AGGREGATE_TOP_N):
+    """Collapse chunk scores to one score per group with a vectorised group-by.
+
+    `method` is "max" or "topn_mean" (mean of each group's best `top_n`
+    chunks). Returns `(groups, group_scores)` sorted by descending score.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return [], np.empty(0, dtype=np.float32)
+    groups, inverse = np.unique(np.asarray(group_ids, dtype=object), return_inverse=True)
+    inverse = inverse.ravel()
+
+    if method == "max":
+        result = np.full(len(groups), -np.inf, dtype=np.float32)
+        np.maximum.at(result, inverse, scores)
+    elif method == "topn_mean":
+        # Order by group, then by descending score; rank each chunk within its group.
+        order = np.lexsort((-scores, inverse))
+        sorted_groups = inverse[order]
+        starts = np.searchsorted(sorted_groups, np.arange(len(groups)))
+        ranks = np.arange(len(order)) - starts[sorted_groups]
+        keep = order[ranks < top_n]
+        sums = np.bincount(inverse[keep], weights=scores[keep], minlength=len(groups))
+        counts = np.minimum(np.bincount(inverse, minlength=len(groups)), top_n)
+        result = (sums / counts).astype(np.float32)
+    else:
+        raise ValueError(f"Unknown aggregation method: {method!r}")
+
+    ranking = np.argsort(-result, kind="stable")
+    return groups[ranking].tolist(), result[ranking]
@@ -0,0 +1,92 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+# Collapse re-submitted resumes (re-exported or lightly edited PDFs) at ingest.
+DEDUP_RESUMES = os.getenv("DEDUP_RESUMES", "1").lower() in ("1", "true", "yes")
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "128"))
+# 16 bands of 8 rows: pairs above ~0.7 estimated Jaccard almost always share a bucket.
+LSH_BANDS = int(os.getenv("LSH_BANDS", "16"))
+SHINGLE_WORDS = int(os.getenv("SHINGLE_WORDS", "5"))
+# Candidate pairs must also be this close in embedding space.
+DEDUP_COSINE = float(os.getenv("DEDUP_COSINE", "0.97"))
+
+_WORD = re.compile(r"\w+")
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """crc32 hashes of the distinct `size`-word shingles of `text`."""
+    words = _WORD.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))} if words else set()
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash signatures from `permutations` universal hashes (a * x + b) mod (2**61 - 1)."""
+
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, seed=0):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**31 and x < 2**32 keep a * x + b inside uint64
+        self.a = rng.integers(1, 1 << 31, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, permutations, dtype=np.uint64)
+
+    def signature(self, hashes):
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def candidate_pairs(signatures, bands=LSH_BANDS):
+    """Row pairs (i < j) whose signatures agree on every row of at least one band."""
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        _, buckets = np.unique(signatures[:, band * rows:(band + 1) * rows], axis=0, return_inverse=True)
+        buckets = buckets.ravel()
+        order = np.argsort(buckets, kind="stable")
+        for group in np.split(order, np.flatnonzero(np.diff(buckets[order])) + 1):
+            members = group.tolist()
+            pairs.update((a, b) for pos, a in enumerate(members) for b in members[pos + 1:])
+    return sorted(pairs)
+
+
+def find_duplicates(texts, embed_rows, threshold=DEDUP_COSINE):
+    """Map each near-duplicate row of `texts` to the earliest row it duplicates.
+
+    MinHash + LSH banding proposes candidate pairs from the text alone;
+    `embed_rows(rows)` then returns unit vectors for just the rows in some
+    candidate pair, and a pair counts when their cosine is >= `threshold`.
+    Confirmed pairs are merged transitively.
+    """
+    hasher = MinHasher()
+    hashed = [(row, shingles(text)) for row, text in enumerate(texts)]
+    # Empty texts (e.g. image-only PDFs) would all collide
+    hashed = [(row, hashes) for row, hashes in hashed if len(hashes)]
+    if len(hashed) < 2:
+        return {}
+    signatures = np.stack([hasher.signature(hashes) for _, hashes in hashed])
+    pairs = [(hashed[i][0], hashed[j][0]) for i, j in candidate_pairs(signatures)]
+    if not pairs:
+        return {}
+
+    rows = sorted({row for pair in pairs for row in pair})
+    position = {row: pos for pos, row in enumerate(rows)}
+    vectors = np.asarray(embed_rows(rows), dtype=np.float32)
+    left = vectors[[position[a] for a, _ in pairs]]
+    right = vectors[[position[b] for _, b in pairs]]
+    cosines = np.einsum("ij,ij->i", left, right)
+
+    parent = {}
+
+    def root(row):
+        while parent.get(row, row) != row:
+            row = parent[row]
+        return row
+
+    for (a, b), cosine in zip(pairs, cosines.tolist()):
+        if cosine >= threshold:
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+    return {row: root(row) for row in parent}
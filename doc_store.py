@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+import time
+
+DOC_STORE_PATH = os.getenv("DOC_STORE_PATH", ".cache/documents.sqlite3")
+
+
+class DocStore:
+    """Resume text kept out of the vector index, keyed by vector id.
+
+    Backed by a single SQLite file so the text doesn't travel with every
+    upsert and query. Writes made for a session namespace also record which
+    ids it holds and when it last uploaded, so expiring a session can drop
+    exactly the text no other namespace still uses.
+    """
+
+    def __init__(self, path=DOC_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, touched_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, last_upload REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS namespace_documents ("
+                "namespace TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (namespace, id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS namespace_documents_id ON namespace_documents (id)")
+
+    def put_many(self, items, namespace=None):
+        """Store `(id, text)` pairs, as uploaded to `namespace` if given."""
+        now = time.time()
+        items = list(items)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO documents (id, text, touched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET text = excluded.text, touched_at = excluded.touched_at",
+                [(doc_id, text, now) for doc_id, text in items],
+            )
+            if namespace is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO namespace_documents (namespace, id) VALUES (?, ?)",
+                    [(namespace, doc_id) for doc_id, _ in items],
+                )
+                self._record_upload(namespace, now)
+
+    def _record_upload(self, namespace, timestamp):
+        self._conn.execute(
+            "INSERT INTO namespaces (namespace, last_upload) VALUES (?, ?) "
+            "ON CONFLICT(namespace) DO UPDATE SET last_upload = MAX(last_upload, excluded.last_upload)",
+            (namespace, timestamp),
+        )
+
+    def record_upload(self, namespace, timestamp):
+        """Note that `namespace` received an upload at `timestamp`."""
+        with self._lock, self._conn:
+            self._record_upload(namespace, timestamp)
+
+    def last_uploads(self):
+        """Return a dict of namespace -> time of its most recent upload."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT namespace, last_upload FROM namespaces"))
+
+    def delete_namespace(self, namespace):
+        """Forget `namespace` and delete the text only it used; returns the ids deleted."""
+        with self._lock, self._conn:
+            deleted = [doc_id for doc_id, in self._conn.execute(
+                "SELECT id FROM namespace_documents WHERE namespace = ? "
+                "AND id NOT IN (SELECT id FROM namespace_documents WHERE namespace != ?)",
+                (namespace, namespace),
+            )]
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in deleted])
+            self._conn.execute("DELETE FROM namespace_documents WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM namespaces WHERE namespace = ?", (namespace,))
+            return deleted
+
+    def get_many(self, ids):
+        """Return a dict of id -> text for the ids that are present."""
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit.
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id, text FROM documents WHERE id IN ({placeholders})", chunk
+                )
+                found.update(rows)
+        return found
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from single_writer import claim_directory
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+
+def content_hash(data):
+    """SHA-256 hex digest of a resume's raw PDF bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk cache of extracted text and embeddings, keyed by PDF content hash.
+
+    Each model gets its own directory holding:
+
+    - `vectors.npy`: a memory-mapped float32 matrix, one row per slot
+    - `texts/<hash>.txt`: the extracted text for each entry
+    - `index.json`: hash -> (slot, text bytes) in least-recently-used order
+
+    Entries are evicted least recently used first once text plus vector bytes
+    exceed `max_bytes`. Only one process may use a directory (see
+    single_writer.claim_directory); within the process all access goes
+    through one lock.
+    """
+
+    def __init__(self, model_name, root=EMBEDDING_CACHE_DIR, max_bytes=EMBEDDING_CACHE_MAX_MB * 2**20):
+        self.path = os.path.join(root, model_name.replace("/", "__"))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # hash -> [slot or None, text bytes]
+        self._vectors = None
+        self._dimension = None
+        self._total_bytes = 0
+        self._dirty = False
+        os.makedirs(os.path.join(self.path, "texts"), exist_ok=True)
+        claim_directory(self.path)
+        self._load()
+
+    # -- persistence ---------------------------------------------------------
+
+    def _index_path(self):
+        return os.path.join(self.path, "index.json")
+
+    def _vectors_path(self):
+        return os.path.join(self.path, "vectors.npy")
+
+    def _text_path(self, key):
+        return os.path.join(self.path, "texts", f"{key}.txt")
+
+    def _load(self):
+        if not os.path.exists(self._index_path()):
+            return
+        with open(self._index_path()) as f:
+            index = json.load(f)
+        self._dimension = index.get("dimension")
+        for key, slot, text_bytes in index["entries"]:
+            self._entries[key] = [slot, text_bytes]
+        self._total_bytes = sum(self._entry_bytes(entry) for entry in self._entries.values())
+        if os.path.exists(self._vectors_path()):
+            self._vectors = np.load(self._vectors_path(), mmap_mode="r+")
+
+    def flush(self):
+        """Write the index and vector matrix to disk."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "dimension": self._dimension,
+                "entries": [[key, slot, text_bytes] for key, (slot, text_bytes) in self._entries.items()],
+            }, f)
+        os.replace(tmp, self._index_path())
+        self._dirty = False
+
+    # -- slots ---------------------------------------------------------------
+
+    def _entry_bytes(self, entry):
+        slot, text_bytes = entry
+        return text_bytes + (self._dimension * 4 if slot is not None else 0)
+
+    def _allocate(self, count):
+        """Return `count` unused vector slots, growing the matrix if needed."""
+        used = {slot for slot, _ in self._entries.values() if slot is not None}
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        slots = [slot for slot in range(capacity) if slot not in used][:count]
+        if len(slots) < count:
+            needed = len(used) + count
+            self._grow(max(64, capacity * 2, needed))
+            slots += list(range(capacity, capacity + count - len(slots)))
+        return slots
+
+    def _grow(self, capacity):
+        path = self._vectors_path()
+        tmp = path + ".tmp.npy"
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self._dimension))
+        if self._vectors is not None:
+            grown[: self._vectors.shape[0]] = self._vectors
+            self._vectors.flush()
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp, path)
+        self._vectors = np.load(path, mmap_mode="r+")
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= self._entry_bytes(entry)
+            try:
+                os.remove(self._text_path(key))
+            except FileNotFoundError:
+                pass
+            self._dirty = True
+
+    # -- public API ----------------------------------------------------------
+
+    def get_text(self, key):
+        """Return the cached extracted text for `key`, or None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._text_path(key), encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                self._total_bytes -= self._entry_bytes(self._entries.pop(key))
+                self._dirty = True
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def put_text(self, key, text):
+        """Store the extracted text for `key`; call flush() after a batch."""
+        data = text.encode("utf-8")
+        with self._lock:
+            with open(self._text_path(key), "wb") as f:
+                f.write(data)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [None, len(data)]
+            else:
+                self._total_bytes -= entry[1]
+                entry[1] = len(data)
+                self._entries.move_to_end(key)
+            self._total_bytes += len(data)
+            self._dirty = True
+            self._evict()
+
+    def get_vectors(self, keys):
+        """Return a list with a cached float32 vector (or None) for each key."""
+        with self._lock:
+            found = []
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] is None:
+                    found.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                found.append(np.array(self._vectors[entry[0]]))
+            return found
+
+    def put_vectors(self, keys, vectors):
+        """Store one vector per key; keys must already have text via put_text."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = int(vectors.shape[1])
+            pairs = [(self._entries[key], vector) for key, vector in zip(keys, vectors) if key in self._entries]
+            slots = iter(self._allocate(sum(1 for entry, _ in pairs if entry[0] is None)))
+            for entry, vector in pairs:
+                if entry[0] is None:
+                    entry[0] = next(slots)
+                    self._total_bytes += self._dimension * 4
+                self._vectors[entry[0]] = vector
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            self._dirty = True
+            self._evict()
+            self._flush()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
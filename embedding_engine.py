@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+
+import metrics
+
+# Micro-batch limits: at most EMBED_BATCH_SIZE texts per forward pass, and at
+# most EMBED_MAX_BATCH_TOKENS padded word pieces (count x longest text).
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+DEFAULT_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "8192"))
+
+# Inference backend for the sentence-transformers model: "torch" (fp32),
+# "int8" (torch dynamic quantization of the Linear layers) or "onnx" (ONNX
+# Runtime; needs `optimum[onnxruntime]`). All three keep the same API.
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op threads for inference; 0 means every core this process may run on.
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# ONNX graph inside the model repo, e.g. "onnx/model_qint8_avx2.onnx"; empty for the default export.
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+
+
+def available_cores():
+    """CPUs this process may run on (respects container/cgroup affinity where exposed)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _sentence_model(embeddings):
+    """Return the sentence-transformers model behind a langchain wrapper, if any."""
+    model = getattr(embeddings, "client", None)
+    return model if hasattr(model, "encode") else None
+
+
+def _max_seq_length(model):
+    return getattr(model, "max_seq_length", None) or 256
+
+
+def estimate_tokens(text, max_seq_length=256):
+    """Cheap word-piece estimate used to bucket texts of similar length."""
+    return min(max_seq_length, int(len(text.split()) * 1.3) + 2)
+
+
+def plan_batches(lengths, batch_size=DEFAULT_BATCH_SIZE, max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS):
+    """Group text indices into micro-batches of similar token length.
+
+    Texts are sorted longest first so each batch pads to its first member;
+    a batch closes once it holds `batch_size` texts or adding one more would
+    exceed `max_batch_tokens` padded tokens.
+    """
+    order = np.argsort(-np.asarray(lengths, dtype=np.int64), kind="stable")
+    batches, current, longest = [], [], 0
+    for idx in order.tolist():
+        if not current:
+            longest = max(int(lengths[idx]), 1)
+        elif len(current) >= batch_size or (len(current) + 1) * longest > max_batch_tokens:
+            batches.append(current)
+            current, longest = [], max(int(lengths[idx]), 1)
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _encode(embeddings, model, texts):
+    # Mirror HuggingFaceEmbeddings.embed_documents so vectors stay identical.
+    texts = [text.replace("\n", " ") for text in texts]
+    if model is None:
+        return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    encode_kwargs = dict(getattr(embeddings, "encode_kwargs", None) or {})
+    encode_kwargs["batch_size"] = len(texts)
+    vectors = model.encode(texts, convert_to_numpy=True, show_progress_bar=False, **encode_kwargs)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_texts(embeddings, texts, batch_size=None, max_batch_tokens=None, on_batch=None):
+    """Embed `texts` in length-bucketed micro-batches.
+
+    Returns a C-contiguous float32 matrix with one row per input text, in
+    input order. `on_batch(rows, vectors)` is called after each batch with
+    the input indices it covered.
+    """
+    texts = list(texts)
+    model = _sentence_model(embeddings)
+    if not texts:
+        dim = model.get_sentence_embedding_dimension() if model is not None else 0
+        return np.empty((0, dim or 0), dtype=np.float32)
+
+    max_len = _max_seq_length(model)
+    lengths = [estimate_tokens(text, max_len) for text in texts]
+    metrics.inc("resume_embedded_tokens_total", sum(lengths), help="Estimated tokens sent to the embedding model.")
+    batches = plan_batches(
+        lengths,
+        batch_size or DEFAULT_BATCH_SIZE,
+        max_batch_tokens or DEFAULT_MAX_BATCH_TOKENS,
+    )
+
+    matrix = None
+    for batch in batches:
+        vectors = _encode(embeddings, model, [texts[idx] for idx in batch])
+        if matrix is None:
+            matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        matrix[batch] = vectors
+        if on_batch is not None:
+            on_batch(batch, vectors)
+    return np.ascontiguousarray(matrix)
+
+
+def embed_query(embeddings, text):
+    """Embed a single query string as a 1-D float32 vector."""
+    return embed_texts(embeddings, [text])[0]
+
+
+def model_key(model_name, backend=EMBEDDING_BACKEND):
+    """Identify vectors by model and backend; quantized backends' vectors differ slightly from fp32."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def load_embeddings(model_name, backend=EMBEDDING_BACKEND, threads=EMBEDDING_THREADS):
+    """Load `model_name` behind langchain's HuggingFaceEmbeddings on the given backend.
+
+    Every backend returns the same wrapper (with a sentence-transformers
+    `.client`), so embed_texts/embed_query callers don't change.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got {backend!r}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    threads = threads or available_cores()
+    model_kwargs = {"device": "cpu"}
+    if backend == "onnx":
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        ort_kwargs = {"session_options": session_options, "provider": "CPUExecutionProvider"}
+        if EMBEDDING_ONNX_FILE:
+            ort_kwargs["file_name"] = EMBEDDING_ONNX_FILE
+        model_kwargs.update(backend="onnx", model_kwargs=ort_kwargs)
+    else:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+    if backend == "int8":
+        import torch
+
+        torch.quantization.quantize_dynamic(embeddings.client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embeddings
+
+
+def cosine_drift(reference, candidate):
+    """Summarise how far `candidate` vectors drift from `reference` (row-aligned matrices)."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    norms[norms == 0] = 1.0
+    cosine = np.einsum("ij,ij->i", reference, candidate) / norms
+    drift = 1.0 - cosine
+    return {
+        "count": int(len(cosine)),
+        "mean_cosine": float(cosine.mean()) if len(cosine) else 1.0,
+        "min_cosine": float(cosine.min()) if len(cosine) else 1.0,
+        "p99_drift": float(np.percentile(drift, 99)) if len(drift) else 0.0,
+        "max_drift": float(drift.max()) if len(drift) else 0.0,
+    }
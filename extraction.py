@@ -0,0 +1,293 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from page_cache import get_page_cache
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "60"))
+# Page parser: "pypdf" or "pymupdf" (faster; `pip install pymupdf`). Their
+# output differs slightly, so the page cache keeps them apart.
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "pypdf")
+# Stop reading pages once this many (estimated) word pieces are extracted;
+# 0 reads every page. Only trailing pages are dropped, never partial ones.
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "0"))
+
+
+@metrics.timed("get_pdf_text")
+def get_pdf_text(pdf_doc):
+    """Extract text from a PDF file."""
+    return _extract_text(read_pdf_bytes(pdf_doc))[0]
+
+
+def _page_key(backend, content, parts):
+    digest = hashlib.sha256(backend.encode("utf-8"))
+    digest.update(content)
+    for part in parts:
+        digest.update(b"\0" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _plain(value, depth=0):
+    """Stable text form of a pypdf object; streams become digests, font programs are left out."""
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(value, IndirectObject):
+        value = value.get_object() if depth < 6 else None
+    if isinstance(value, StreamObject):
+        return hashlib.sha256(value.get_data()).hexdigest()
+    if isinstance(value, DictionaryObject):
+        return "{" + ",".join(
+            f"{key}:{_plain(item, depth + 1)}" for key, item in sorted(value.items()) if key != "/FontDescriptor"
+        ) + "}"
+    if isinstance(value, ArrayObject):
+        return "[" + ",".join(_plain(item, depth + 1) for item in value) + "]"
+    return str(value)
+
+
+def _pypdf_resources(resources, parts, memo, depth=0):
+    """Append what `resources` contributes to the page's text; returns whether it holds any font.
+
+    Fonts are usually shared objects, so their text form is memoised per
+    document in `memo`.
+    """
+    resources = resources.get_object() if resources is not None else None
+    if not resources or depth > 4:
+        return False
+    fonts = resources.get("/Font")
+    has_fonts = bool(fonts) and bool(fonts.get_object())
+    if has_fonts:
+        for name, font in sorted(fonts.get_object().items()):
+            ref = (font.idnum, font.generation) if hasattr(font, "idnum") else None
+            plain = memo.get(ref) if ref is not None else None
+            if plain is None:
+                plain = _plain(font)
+                if ref is not None:
+                    memo[ref] = plain
+            parts.append(f"{name}={plain}")
+    # Form XObjects draw text of their own
+    xobjects = resources.get("/XObject")
+    for name, xobject in sorted((xobjects.get_object() if xobjects is not None else {}).items()):
+        xobject = xobject.get_object()
+        if xobject.get("/Subtype") == "/Form":
+            parts.append(f"{name}={hashlib.sha256(xobject.get_data()).hexdigest()}")
+            has_fonts = _pypdf_resources(xobject.get("/Resources"), parts, memo, depth + 1) or has_fonts
+    return has_fonts
+
+
+def _pypdf_pages(data):
+    from pypdf import PdfReader  # deferred to the first parse; workers import it once
+
+    memo = {}
+    for page in PdfReader(io.BytesIO(data)).pages:
+        parts = []
+        if not _pypdf_resources(page.get("/Resources"), parts, memo):
+            yield None, None  # nothing to draw text with: image-only page
+            continue
+        contents = page.get_contents()
+        key = _page_key("pypdf", contents.get_data() if contents is not None else b"", parts)
+        yield key, lambda page=page: page.extract_text() or ""
+
+
+def _pymupdf_pages(data):
+    import pymupdf
+
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        for page in document:
+            # (xref, ext, type, basefont, name, encoding, referencer); xrefs differ between files
+            fonts = [repr(font[1:6]) for font in page.get_fonts(full=True)]
+            if not fonts:
+                yield None, None
+                continue
+            yield _page_key("pymupdf", page.read_contents(), fonts), page.get_text
+
+
+_BACKENDS = {"pypdf": _pypdf_pages, "pymupdf": _pymupdf_pages}
+
+
+def _extract_text(data, backend=None, token_budget=None):
+    """Text of a PDF's pages plus per-page counts, reusing cached page text.
+
+    Returns (text, stats) with stats holding "pages" read, "skipped"
+    image-only pages and page cache "hits"/"misses". Text matches a plain
+    page-by-page `extract_text()`, up to the token budget.
+    """
+    backend = backend or EXTRACT_BACKEND
+    token_budget = EXTRACT_TOKEN_BUDGET if token_budget is None else token_budget
+    if backend not in _BACKENDS:
+        raise ValueError(f"EXTRACT_BACKEND must be one of {sorted(_BACKENDS)}, got {backend!r}")
+    cache = get_page_cache()
+    texts, fresh, tokens = [], [], 0
+    stats = {"pages": 0, "skipped": 0, "hits": 0, "misses": 0}
+    for key, extract in _BACKENDS[backend](data):
+        stats["pages"] += 1
+        if key is None:
+            stats["skipped"] += 1
+            continue
+        text = cache.get(key) if cache is not None else None
+        if text is None:
+            text = extract()
+            fresh.append((key, text))
+            stats["misses"] += 1
+        else:
+            stats["hits"] += 1
+        texts.append(text)
+        tokens += int(len(text.split()) * 1.3)
+        if token_budget and tokens >= token_budget:
+            break
+    if cache is not None:
+        cache.put_many(fresh)
+    return "".join(texts), stats
+
+
+class LocalPDF:
+    """A PDF on disk with the `name`/`size`/`getvalue()` surface of a Streamlit upload."""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.name = os.path.basename(self.path)
+        self.size = os.path.getsize(self.path)
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def __repr__(self):
+        return f"LocalPDF({self.path!r})"
+
+
+def read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file, file object or path."""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _extract(data):
+    # Runs in a worker process; only bytes cross the process boundary. Page
+    # counts and parse time come back too, since metrics live in the parent.
+    started = time.perf_counter()
+    text, stats = _extract_text(data)
+    return text, stats, time.perf_counter() - started
+
+
+def _record(result):
+    text, stats, elapsed = result
+    metrics.observe("resume_stage_seconds", elapsed, stage="get_pdf_text")
+    metrics.inc("resume_pages_total", stats["pages"], help="PDF pages extracted.")
+    metrics.inc("resume_pages_skipped_total", stats["skipped"], help="Image-only PDF pages skipped.")
+    if stats["hits"] or stats["misses"]:
+        metrics.cache_lookup("page", stats["hits"], stats["misses"])
+    return text
+
+
+def _terminate(executor):
+    """Kill the pool's workers, including ones stuck on a pathological PDF."""
+    terminate_workers = getattr(executor, "terminate_workers", None)
+    if terminate_workers is not None:  # Python 3.14+
+        terminate_workers()
+        return
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_pool(workers):
+    # Callers run threads (Streamlit, server jobs, ingest stages); a forked
+    # worker could inherit one of their locks held, so start workers clean
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Workers fork from a server that has the parser imported already
+        context.set_forkserver_preload(["extraction", "pypdf"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def iter_pdf_texts(user_pdf_list, max_workers=None, timeout=None):
+    """Extract text from PDFs over a process pool, yielding as files finish.
+
+    Yields `(position, pdf_file, text, error)` tuples in completion order,
+    where `position` is the file's index in `user_pdf_list`. A file that
+    raises or runs longer than `timeout` seconds yields `text=None` and the
+    exception. Timed-out workers can't be cancelled individually, so the pool
+    is restarted and the other in-flight files are resubmitted. A worker that
+    dies (e.g. OOM-killed) breaks the pool: every file in flight yields the
+    BrokenProcessPool error and the pool is rebuilt for the rest. Even a
+    single file is parsed in a worker, so the deadline always holds.
+    """
+    files = list(user_pdf_list)
+    if not files:
+        return
+    workers = max(1, min(max_workers or EXTRACT_WORKERS, len(files)))
+    timeout = EXTRACT_TIMEOUT if timeout is None else timeout
+
+    pending = deque(enumerate(files))
+    running = {}
+    executor = _new_pool(workers)
+    try:
+        while pending or running:
+            # Keep at most `workers` files in flight so each deadline starts
+            # when the file actually starts parsing.
+            broken = None
+            while pending and len(running) < workers:
+                position, pdf_file = pending.popleft()
+                try:
+                    future = executor.submit(_extract, read_pdf_bytes(pdf_file))
+                except BrokenProcessPool as e:
+                    # This file never reached the pool; it goes to the next one
+                    pending.appendleft((position, pdf_file))
+                    broken = e
+                    break
+                running[future] = (position, pdf_file, time.monotonic() + timeout)
+
+            if broken is None:
+                next_deadline = min(deadline for _, _, deadline in running.values())
+                done, _ = wait(running, timeout=max(0.0, next_deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, pdf_file, _ = running.pop(future)
+                    try:
+                        yield position, pdf_file, _record(future.result()), None
+                    except BrokenProcessPool as e:
+                        broken = e
+                        yield position, pdf_file, None, e
+                    except Exception as e:
+                        yield position, pdf_file, None, e
+
+            if broken is not None:
+                # Which file killed the worker is unknown, so every file in flight fails
+                for position, pdf_file, _ in running.values():
+                    yield position, pdf_file, None, broken
+                running.clear()
+                _terminate(executor)
+                executor = _new_pool(workers)
+                continue
+
+            now = time.monotonic()
+            expired = [future for future, (_, _, deadline) in running.items() if deadline <= now]
+            if expired:
+                for future in expired:
+                    position, pdf_file, _ = running.pop(future)
+                    yield position, pdf_file, None, TimeoutError(
+                        f"PDF extraction exceeded {timeout:g}s"
+                    )
+                pending.extendleft((position, pdf_file) for position, pdf_file, _ in running.values())
+                running.clear()
+                _terminate(executor)
+                executor = _new_pool(workers)
+    finally:
+        if running:
+            _terminate(executor)
+        else:
+            executor.shutdown(wait=False)
@@ -0,0 +1,147 @@
+import logging
+import os
+import queue
+import threading
+
+import metrics
+import resources
+import sessions
+from chunking import CHUNK_TOKENS
+from resources import EMBEDDING_DIMENSION
+from utils4 import iter_docs, prepare_upload, store_upload
+
+# Ceiling on resume data held in flight by stream_ingest; batch sizes follow from it.
+INGEST_MEMORY_MB = float(os.getenv("INGEST_MEMORY_MB", "256"))
+# Batches buffered between two stages before the upstream one waits.
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "2"))
+
+# Rough in-flight cost of one chunk: its text (in the chunk, the resume and
+# the doc store write), float32 row, and the upsert payload's Python floats.
+_BYTES_PER_TOKEN = 24
+_BYTES_PER_DIMENSION = 40
+_CHUNKS_PER_RESUME = 4
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def batch_chunks(memory_mb=INGEST_MEMORY_MB, queue_depth=INGEST_QUEUE_DEPTH, dimension=EMBEDDING_DIMENSION):
+    """Chunks per batch so every batch in flight fits in `memory_mb`.
+
+    Each of the three stages works on one batch while up to `queue_depth`
+    more wait in front of each of the two downstream stages.
+    """
+    in_flight = 3 + 2 * queue_depth
+    chunk_bytes = CHUNK_TOKENS * _BYTES_PER_TOKEN + dimension * _BYTES_PER_DIMENSION
+    return max(1, int(memory_mb * 2**20 / (in_flight * chunk_bytes)))
+
+
+def prefetch(iterable, maxsize, name="ingest"):
+    """Iterate `iterable` on a background thread, at most `maxsize` items ahead.
+
+    The producer blocks once the queue is full, so a slow consumer throttles
+    every stage upstream of it. Exceptions are re-raised in the consumer, and
+    closing the generator stops the producer.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((None, e))
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _resume_batches(parsed, max_chunks):
+    """Group (position, Document) pairs into lists of about `max_chunks` chunks' worth of resumes."""
+    max_words = max_chunks * CHUNK_TOKENS
+    batch, words = [], 0
+    for item in parsed:
+        size = len(item[1].page_content.split())
+        if batch and words + size > max_words:
+            yield batch
+            batch, words = [], 0
+        batch.append(item)
+        words += size
+    if batch:
+        yield batch
+
+
+@metrics.timed("stream_ingest")
+def stream_ingest(pdf_files, unique_id, api_key, environment, index_name, embeddings, on_progress=None,
+                  memory_mb=INGEST_MEMORY_MB, queue_depth=INGEST_QUEUE_DEPTH):
+    """Ingest uploads as a files -> text -> chunks -> embeddings -> upsert stream.
+
+    Each stage runs on its own thread and hands batches on through a queue
+    of `queue_depth`, sized so everything in flight stays under `memory_mb`
+    whatever the number of files. The index itself still grows with the
+    upload (a local one keeps its codes, ids and metadata in RAM) and is
+    flushed once, after the last batch. Duplicates are collapsed
+    within each batch, and each stored batch is merged into the shortlists
+    of any open roles. `on_progress(stage, done, total, **details)` counts
+    resumes: "parse" as files are read, "embed" with each embedded batch's
+    `docs`, `chunks` and `vectors`, and "upsert" once the batch is indexed.
+    Returns the number of vectors upserted.
+    """
+    pdf_files = list(pdf_files)
+    total = len(pdf_files)
+    index = resources.get_vector_store(api_key, environment, index_name)
+    sessions.maybe_collect_expired_sessions(
+        index, (api_key, index_name), resources.get_doc_store(), resources.get_lexical_index(),
+        resources.get_open_roles())
+    max_chunks = batch_chunks(memory_mb, queue_depth)
+    progress = {"parse": 0, "embed": 0, "upsert": 0}
+
+    def report(stage, count, **details):
+        progress[stage] += count
+        if on_progress is not None:
+            on_progress(stage, progress[stage], total, **details)
+
+    def parsed():
+        for item in iter_docs(pdf_files, unique_id):
+            report("parse", 1)
+            yield item
+
+    def embedded():
+        resumes = prefetch(parsed(), max(1, max_chunks // _CHUNKS_PER_RESUME) * queue_depth, "ingest-parse")
+        for batch in _resume_batches(resumes, max_chunks):
+            docs = [doc for _, doc in sorted(batch, key=lambda item: item[0])]
+            docs, ids, chunks, matrix = prepare_upload(embeddings, docs)
+            report("embed", len(batch), docs=docs, chunks=chunks, vectors=matrix)
+            yield len(batch), docs, ids, chunks, matrix
+
+    count = 0
+    for resumes, docs, ids, chunks, matrix in prefetch(embedded(), queue_depth, "ingest-embed"):
+        # A local index rewrites a namespace's files on flush, so flush once at the end
+        count += store_upload(index, unique_id, docs, ids, chunks, matrix, embeddings, flush=False)
+        report("upsert", resumes)
+    if hasattr(index, "flush"):
+        index.flush()
+    logger.info("Streamed %d resumes into %d vectors (%d-chunk batches).", progress["parse"], count, max_chunks)
+    return count
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+
+import numpy as np
+
+from single_writer import claim_directory
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", ".cache/lexical")
+# Segments per namespace before they are merged into one.
+LEXICAL_MAX_SEGMENTS = int(os.getenv("LEXICAL_MAX_SEGMENTS", "8"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# How similar_docs combines BM25 with vector scores: "off", "rrf" (reciprocal
+# rank fusion) or "weighted" (HYBRID_WEIGHT of max-normalised BM25 blended
+# into the cosine score).
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "off")
+HYBRID_WEIGHT = float(os.getenv("HYBRID_WEIGHT", "0.3"))
+# Once a namespace holds more resumes than this, only the top LEXICAL_PREFILTER
+# BM25 matches are vector-scored; 0 disables the prefilter.
+LEXICAL_PREFILTER = int(os.getenv("LEXICAL_PREFILTER", "0"))
+
+# Keeps tokens like "c++", "c#", "node.js" and "asp.net" whole.
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our the their this to was we were will with "
+    "you your".split()
+)
+_DEFAULT_NAMESPACE = "__default__"
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class _Segment:
+    """Immutable CSR postings: the rows containing terms[t] are docs[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, terms, offsets, docs, tfs):
+        self.terms = terms  # term -> i
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.name = None  # directory name once saved
+
+    @classmethod
+    def build(cls, postings):
+        """From {term: [(row, tf), ...]} with rows ascending per term."""
+        terms = sorted(postings)
+        sizes = np.fromiter((len(postings[term]) for term in terms), dtype=np.int64, count=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        pairs = np.array([pair for term in terms for pair in postings[term]], dtype=np.int64).reshape(-1, 2)
+        return cls(
+            {term: i for i, term in enumerate(terms)},
+            offsets,
+            pairs[:, 0].astype(np.int32),
+            np.minimum(pairs[:, 1], np.iinfo(np.uint16).max).astype(np.uint16),
+        )
+
+    def postings(self, term):
+        i = self.terms.get(term)
+        if i is None:
+            return None, None
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:stop], self.tfs[start:stop]
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ("offsets", "docs", "tfs"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "terms.json"), "w") as f:
+            json.dump(sorted(self.terms, key=self.terms.get), f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "terms.json")) as f:
+            terms = {term: i for i, term in enumerate(json.load(f))}
+        arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ("offsets", "docs", "tfs")]
+        segment = cls(terms, *arrays)
+        segment.name = os.path.basename(directory)
+        return segment
+
+
+class _LexicalNamespace:
+    def __init__(self, doc_ids=None, lengths=None, segments=None):
+        self.doc_ids = doc_ids or []
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self.lengths = list(lengths) if lengths is not None else []
+        self.segments = segments or []
+
+    def add(self, doc_ids, texts):
+        postings = {}
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id in self.rows:
+                continue  # ids are content-derived, so the text is unchanged
+            row = len(self.doc_ids)
+            self.rows[doc_id] = row
+            self.doc_ids.append(doc_id)
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        if not postings:
+            return False
+        self.segments.append(_Segment.build(postings))
+        if len(self.segments) > LEXICAL_MAX_SEGMENTS:
+            self.merge()
+        return True
+
+    def merge(self):
+        """Fold every segment into one; rows only grow, so concatenation keeps them sorted."""
+        postings = {}
+        for segment in self.segments:
+            for term, i in segment.terms.items():
+                start, stop = segment.offsets[i], segment.offsets[i + 1]
+                postings.setdefault(term, []).extend(
+                    zip(segment.docs[start:stop].tolist(), segment.tfs[start:stop].tolist())
+                )
+        self.segments = [_Segment.build(postings)] if postings else []
+
+    def scores(self, terms):
+        """BM25 score of every document (row-aligned float32) for the query `terms`."""
+        count = len(self.doc_ids)
+        scores = np.zeros(count, dtype=np.float32)
+        if not count:
+            return scores
+        lengths = np.asarray(self.lengths, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()), 1.0))
+        for term, weight in Counter(terms).items():
+            hits = [segment.postings(term) for segment in self.segments]
+            hits = [(docs, tfs) for docs, tfs in hits if docs is not None]
+            df = sum(len(docs) for docs, _ in hits)
+            if not df:
+                continue
+            idf = np.log1p((count - df + 0.5) / (df + 0.5))
+            for docs, tfs in hits:
+                tf = tfs.astype(np.float32)
+                # A term appears once per document within a segment, so plain fancy-index add is safe
+                scores[docs] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        return scores
+
+
+class LexicalIndex:
+    """BM25 inverted index over resume text, one set of postings per session namespace.
+
+    Each upload becomes an immutable segment of CSR postings arrays (term
+    offsets, int32 document rows, uint16 term frequencies); once a namespace
+    holds more than LEXICAL_MAX_SEGMENTS segments they are merged. Segments
+    are saved under `<path>/<namespace>/` and memory-mapped on load.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_DIR):
+        self.path = path
+        self._namespaces = {}
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        claim_directory(path)
+
+    def _dir(self, namespace):
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace or _DEFAULT_NAMESPACE)
+        return os.path.join(self.path, name)
+
+    def _namespace(self, namespace):
+        ns = self._namespaces.get(namespace)
+        if ns is not None:
+            return ns
+        directory = self._dir(namespace)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            segments = [_Segment.load(os.path.join(directory, name)) for name in meta["segments"]]
+            ns = _LexicalNamespace(meta["doc_ids"], meta["lengths"], segments)
+        else:
+            ns = _LexicalNamespace()
+        self._namespaces[namespace] = ns
+        return ns
+
+    def _save(self, namespace, ns):
+        directory = self._dir(namespace)
+        os.makedirs(directory, exist_ok=True)
+        existing = set(os.listdir(directory))
+        names = []
+        for position, segment in enumerate(ns.segments):
+            # Segments never change once written; a merged one gets a fresh name
+            if segment.name is None or segment.name not in existing:
+                segment.name = f"seg-{len(ns.doc_ids):08d}-{position:03d}"
+                segment.save(os.path.join(directory, segment.name))
+            names.append(segment.name)
+        tmp = os.path.join(directory, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"namespace": namespace, "doc_ids": ns.doc_ids, "lengths": ns.lengths, "segments": names}, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+        for stale in existing - set(names) - {"meta.json"}:
+            shutil.rmtree(os.path.join(directory, stale), ignore_errors=True)
+
+    def add(self, doc_ids, texts, namespace=""):
+        """Index `texts` under their `doc_ids`; documents already indexed are skipped."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns.add(doc_ids, texts):
+                self._save(namespace, ns)
+
+    def search(self, query, top_k, namespace=""):
+        """Return (doc_ids, scores) of the `top_k` best BM25 matches with a non-zero score."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            scores = ns.scores(tokenize(query))
+            top_k = min(top_k, int(np.count_nonzero(scores)))
+            if top_k <= 0:
+                return [], np.empty(0, dtype=np.float32)
+            top = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")][:top_k]
+            return [ns.doc_ids[row] for row in top.tolist()], scores[top]
+
+    def count(self, namespace=""):
+        with self._lock:
+            return len(self._namespace(namespace).doc_ids)
+
+    def delete(self, namespace=""):
+        """Drop a whole namespace, e.g. when its session expires."""
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+            shutil.rmtree(self._dir(namespace), ignore_errors=True)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank). Returns (ids, scores) best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    ids = sorted(fused, key=fused.get, reverse=True)
+    return ids, np.array([fused[doc_id] for doc_id in ids], dtype=np.float32)
+
+
+def weighted_fusion(vector_scores, lexical_scores, weight):
+    """Blend {id: cosine} with max-normalised {id: bm25}: (1 - weight) * cosine + weight * bm25 / max."""
+    top = max(lexical_scores.values(), default=0.0) or 1.0
+    fused = {
+        doc_id: (1 - weight) * vector_scores.get(doc_id, 0.0) + weight * lexical_scores.get(doc_id, 0.0) / top
+        for doc_id in set(vector_scores) | set(lexical_scores)
+    }
+    ids = sorted(fused, key=fused.get, reverse=True)
+    return ids, np.array([fused[doc_id] for doc_id in ids], dtype=np.float32)
+
+
+def fuse_rankings(vector_ids, vector_scores, lexical_ids, lexical_scores, method=HYBRID_FUSION, weight=HYBRID_WEIGHT):
+    """Combine a vector and a BM25 ranking with `method` ("rrf" or "weighted"); returns (ids, scores)."""
+    if method == "rrf":
+        return reciprocal_rank_fusion([vector_ids, lexical_ids])
+    if method == "weighted":
+        return weighted_fusion(
+            dict(zip(vector_ids, np.asarray(vector_scores).tolist())),
+            dict(zip(lexical_ids, np.asarray(lexical_scores).tolist())),
+            weight,
+        )
+    raise ValueError(f"HYBRID_FUSION must be 'off', 'rrf' or 'weighted', got {method!r}")
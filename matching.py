@@ -0,0 +1,61 @@
+import numpy as np
+
+from chunking import AGGREGATE_TOP_N, RESUME_AGGREGATE
+
+
+def normalize_rows(matrix):
+    """Return `matrix` with each row scaled to unit L2 norm."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def group_chunks(parents, chunk_numbers):
+    """Order chunk rows so each resume's chunks form one contiguous run.
+
+    `parents` and `chunk_numbers` give every row's resume id and chunk
+    number. Returns (order, starts): the rows sorted by resume then chunk,
+    and the position in `order` where each resume's run begins, as
+    resume_score_matrix expects.
+    """
+    order = sorted(range(len(parents)), key=lambda row: (parents[row], chunk_numbers[row]))
+    starts = [pos for pos, row in enumerate(order) if pos == 0 or parents[row] != parents[order[pos - 1]]]
+    return order, starts
+
+
+def resume_score_matrix(query_vectors, chunk_vectors, starts, method=RESUME_AGGREGATE, top_n=AGGREGATE_TOP_N):
+    """Cosine-score every query against every resume in one matrix product.
+
+    `chunk_vectors` holds each resume's chunks as a contiguous run of rows
+    beginning at `starts[i]`. Returns a (queries x resumes) matrix of chunk
+    scores collapsed per resume with "max" or "topn_mean".
+    """
+    scores = normalize_rows(query_vectors) @ normalize_rows(chunk_vectors).T
+    starts = np.asarray(starts, dtype=np.int64)
+    if method == "max":
+        return np.maximum.reduceat(scores, starts, axis=1)
+    if method == "topn_mean":
+        ends = np.append(starts[1:], scores.shape[1])
+        result = np.empty((scores.shape[0], len(starts)), dtype=np.float32)
+        for col, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            block = scores[:, start:end]
+            n = min(top_n, end - start)
+            result[:, col] = np.partition(block, end - start - n, axis=1)[:, -n:].mean(axis=1)
+        return result
+    raise ValueError(f"Unknown aggregation method: {method!r}")
+
+
+def top_k_per_row(scores, k):
+    """Return (indices, scores) of each row's k best columns, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
@@ -0,0 +1,159 @@
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+# Fraction of per-item debug records actually emitted.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+_help = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, help=None, **labels):
+    """Add `amount` to a counter."""
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+        if help:
+            _help.setdefault(name, help)
+
+
+def observe(name, value, help=None, **labels):
+    """Record one observation in a histogram."""
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(_BUCKETS), 0.0, 0]
+        for idx, bound in enumerate(_BUCKETS):
+            if value <= bound:
+                histogram[0][idx] += 1
+        histogram[1] += value
+        histogram[2] += 1
+        if help:
+            _help.setdefault(name, help)
+
+
+@contextmanager
+def span(stage):
+    """Time a block as `resume_stage_seconds{stage=...}`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("resume_stage_seconds", time.perf_counter() - started,
+                help="Wall time per pipeline stage.", stage=stage)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_lookup(cache, hits, misses):
+    """Count cache hits and misses for `cache`."""
+    if hits:
+        inc("resume_cache_hits_total", hits, help="Cache hits by cache.", cache=cache)
+    if misses:
+        inc("resume_cache_misses_total", misses, help="Cache misses by cache.", cache=cache)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def render_prometheus():
+    """Current metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for kind, series in (("counter", _counters), ("histogram", _histograms)):
+            for name in sorted({name for name, _ in series}):
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name != name:
+                        continue
+                    if kind == "counter":
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                        continue
+                    buckets, total, count = value
+                    for bound, bucket_count in zip(_BUCKETS, buckets):
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {bucket_count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """Counters plus per-stage count/mean seconds, for display in the UI."""
+    with _lock:
+        counters = {name + _labels(labels): value for (name, labels), value in _counters.items()}
+        stages = {
+            dict(labels).get("stage", name): {"count": count, "mean_s": total / count if count else 0.0}
+            for (name, labels), (_, total, count) in _histograms.items()
+        }
+    return counters, stages
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serve /metrics on `port` from a daemon thread; at most one server per process."""
+    global _server
+    with _lock:
+        if _server is None and port:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
+
+
+def configure_logging(level=LOG_LEVEL):
+    logging.basicConfig(level=level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def log_sampled(logger, level, msg, *args, rate=LOG_SAMPLE_RATE):
+    """Log a per-item record for roughly `rate` of calls; free when `level` is disabled."""
+    if logger.isEnabledFor(level) and random.random() < rate:
+        logger.log(level, msg, *args)
@@ -0,0 +1,233 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+
+import metrics
+from chunking import RESUME_AGGREGATE
+from embedding_engine import embed_query, model_key
+from matching import group_chunks, resume_score_matrix
+from vector_store import fetch_namespace
+
+# Open roles and their shortlists; empty disables incremental scoring at ingest.
+OPEN_ROLES_PATH = os.getenv("OPEN_ROLES_PATH", ".cache/open_roles.sqlite3")
+OPEN_ROLE_SHORTLIST = int(os.getenv("OPEN_ROLE_SHORTLIST", "10"))
+
+# Resume metadata not worth keeping on a shortlist entry.
+_DROPPED_METADATA = ("content_hash", "uploaded_at", "chunk", "page_content")
+
+
+class OpenRole:
+    """A job description embedded once, with its shortlist size.
+
+    `model_name` is the model_key of the model that embedded it.
+    """
+
+    def __init__(self, role_id, title, description, k, model_name, vector, opened_at):
+        self.id = role_id
+        self.title = title
+        self.description = description
+        self.k = k
+        self.model_name = model_name
+        self.vector = vector
+        self.opened_at = opened_at
+
+    def embedded_with(self, model_name):
+        """Whether `vector` comes from `model_name` on this process's EMBEDDING_BACKEND.
+
+        Takes the name rather than the embeddings, so checking a role
+        doesn't load the model.
+        """
+        return self.model_name == model_key(model_name)
+
+
+class OpenRoles:
+    """Open roles whose shortlists are updated as resumes are ingested.
+
+    Each role stores its embedded job description, so screening against it
+    never re-embeds the text, and its current top-k shortlist. `score`
+    rates a batch of new resumes against every open role with one matrix
+    product and merges them into each role's top-k heap, so keeping all
+    shortlists current costs O(new resumes x roles) rather than a re-query
+    per role. utils4.store_upload calls it for every ingested batch, and
+    resumes are only scored against roles embedded with the same model and
+    backend as their chunks. `discard` drops resumes whose session was
+    collected. Backed by one SQLite file, so the app and server.py
+    processes see the same roles; each merge runs in a write transaction.
+    """
+
+    def __init__(self, path=OPEN_ROLES_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS roles (id TEXT PRIMARY KEY, title TEXT NOT NULL, "
+                "description TEXT NOT NULL, k INTEGER NOT NULL, model_name TEXT NOT NULL, "
+                "vector BLOB NOT NULL, opened_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS shortlist (role_id TEXT NOT NULL, doc_id TEXT NOT NULL, "
+                "score REAL NOT NULL, metadata TEXT NOT NULL, scored_at REAL NOT NULL, "
+                "PRIMARY KEY (role_id, doc_id))"
+            )
+
+    def open(self, title, description, embeddings, k=OPEN_ROLE_SHORTLIST, index=None, namespace=""):
+        """Embed `description` and open a role for it; returns the OpenRole.
+
+        With `index`, the resumes already stored in `namespace` (e.g. the
+        current session's) are scored at once, so the shortlist doesn't
+        start empty.
+        """
+        vector = np.asarray(embed_query(embeddings, description), dtype=np.float32)
+        role = OpenRole(uuid.uuid4().hex, title, description, int(k),
+                        model_key(getattr(embeddings, "model_name", "")), vector, time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO roles (id, title, description, k, model_name, vector, opened_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (role.id, role.title, role.description, role.k, role.model_name, vector.tobytes(), role.opened_at),
+            )
+        if index is not None:
+            self.backfill(role, index, namespace)
+        return role
+
+    def backfill(self, role, index, namespace="", aggregate=RESUME_AGGREGATE):
+        """Merge every resume stored in `namespace` into `role`'s shortlist; returns whether it changed.
+
+        The caller must make sure `index` holds vectors from the role's model.
+        """
+        ids, metadata, vectors = fetch_namespace(index, namespace)
+        if not ids or vectors.shape[1] != role.vector.shape[0]:
+            return False
+        parents = [meta.get("doc_id", vector_id) for vector_id, meta in zip(ids, metadata)]
+        order, starts = group_chunks(parents, [meta.get("chunk", 0) for meta in metadata])
+        resumes = [(parents[order[pos]], metadata[order[pos]]) for pos in starts]
+        return bool(self._score([role], resumes, vectors[order], starts, aggregate))
+
+    def close(self, role_id):
+        """Remove a role and its shortlist."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM shortlist WHERE role_id = ?", (role_id,))
+                self._conn.execute("DELETE FROM roles WHERE id = ?", (role_id,))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def roles(self):
+        """Every open role, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, description, k, model_name, vector, opened_at FROM roles ORDER BY opened_at"
+            ).fetchall()
+        return [OpenRole(role_id, title, description, k, model_name, np.frombuffer(vector, dtype=np.float32),
+                         opened_at)
+                for role_id, title, description, k, model_name, vector, opened_at in rows]
+
+    def discard(self, doc_ids):
+        """Drop `doc_ids` from every shortlist, e.g. once their session is collected; returns the count."""
+        doc_ids = list(doc_ids)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = 0
+                # Stay under SQLite's bound-parameter limit.
+                for start in range(0, len(doc_ids), 500):
+                    chunk = doc_ids[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    removed += self._conn.execute(
+                        f"DELETE FROM shortlist WHERE doc_id IN ({placeholders})", chunk
+                    ).rowcount
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return removed
+
+    def shortlist(self, role_id):
+        """The role's shortlist as (Document, score) pairs, best first; text is not included."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT score, metadata FROM shortlist WHERE role_id = ? ORDER BY score DESC", (role_id,)
+            ).fetchall()
+        return [(Document(page_content="", metadata=json.loads(metadata)), score) for score, metadata in rows]
+
+    def score(self, docs, ids, chunks, vectors, embeddings, aggregate=RESUME_AGGREGATE):
+        """Merge a batch of new resumes into every open role's shortlist.
+
+        `docs`, `ids`, `chunks` and `vectors` are one batch from
+        utils4.prepare_upload, and `embeddings` the model that embedded it. Roles embedded with another
+        model or backend are skipped. Returns the number of shortlists that
+        changed.
+        """
+        if not len(chunks):
+            return 0
+        roles = [role for role in self.roles() if role.embedded_with(getattr(embeddings, "model_name", ""))]
+        by_id = dict(zip(ids, docs))
+        parents = [chunk.metadata["doc_id"] for chunk in chunks]
+        order, starts = group_chunks(parents, [chunk.metadata["chunk"] for chunk in chunks])
+        resumes = [(parents[order[pos]], by_id[parents[order[pos]]].metadata) for pos in starts]
+        return self._score(roles, resumes, np.asarray(vectors, dtype=np.float32)[order], starts, aggregate)
+
+    def _score(self, roles, resumes, vectors, starts, aggregate):
+        # `resumes` holds (doc_id, metadata) per run of `vectors` rows from group_chunks
+        if not roles:
+            return 0
+        with metrics.span("open_roles"):
+            scores = resume_score_matrix(np.stack([role.vector for role in roles]), vectors, starts, method=aggregate)
+            kept = {}
+            for doc_id, metadata in resumes:
+                meta = dict(metadata)
+                for key in _DROPPED_METADATA:
+                    meta.pop(key, None)
+                kept[doc_id] = meta
+
+            changed = 0
+            now = time.time()
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for role, row in zip(roles, scores.tolist()):
+                        changed += self._merge(role, [(doc_id, score) for (doc_id, _), score in zip(resumes, row)],
+                                               kept, now)
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+        metrics.inc("resume_role_scores_total", len(resumes) * len(roles),
+                    help="Resume x open-role scores computed at ingest.")
+        return changed
+
+    def _merge(self, role, candidates, metadata, now):
+        # Top-k heap over the current shortlist plus the new batch; a resume
+        # uploaded again keeps its best score
+        current = dict(self._conn.execute("SELECT doc_id, score FROM shortlist WHERE role_id = ?", (role.id,)))
+        merged = dict(current)
+        for doc_id, score in candidates:
+            merged[doc_id] = max(score, merged.get(doc_id, score))
+        top = dict(heapq.nlargest(role.k, merged.items(), key=lambda item: item[1]))
+        added = [(doc_id, score) for doc_id, score in top.items() if current.get(doc_id) != score]
+        dropped = [doc_id for doc_id in current if doc_id not in top]
+        if not added and not dropped:
+            return 0
+        self._conn.executemany("DELETE FROM shortlist WHERE role_id = ? AND doc_id = ?",
+                               [(role.id, doc_id) for doc_id in dropped])
+        self._conn.executemany(
+            "INSERT INTO shortlist (role_id, doc_id, score, metadata, scored_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(role_id, doc_id) DO UPDATE SET score = excluded.score, "
+            "metadata = excluded.metadata, scored_at = excluded.scored_at",
+            [(role.id, doc_id, float(score), json.dumps(metadata[doc_id]), now) for doc_id, score in added],
+        )
+        return 1
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Extracted text per PDF page, keyed by a hash of what the page draws; empty disables.
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", ".cache/pages.sqlite3")
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "200000"))
+
+# Puts between trims of the oldest entries.
+_PRUNE_EVERY = 1000
+
+
+class PageCache:
+    """Page text shared by every extraction worker through one SQLite file.
+
+    Extraction runs in worker processes, so each process opens its own
+    connection (see `get_page_cache`); WAL mode lets them read while one
+    writes. Once the table holds more than `max_entries`, the oldest
+    entries are dropped.
+    """
+
+    def __init__(self, path=PAGE_CACHE_PATH, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, text TEXT NOT NULL, written_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_written_at ON pages (written_at)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM pages WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, items):
+        """Store `(key, text)` pairs."""
+        items = list(items)
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (key, text, written_at) VALUES (?, ?, ?)",
+                [(key, text, now) for key, text in items],
+            )
+            self._puts += len(items)
+            if self._puts >= _PRUNE_EVERY:
+                self._puts = 0
+                self._conn.execute(
+                    "DELETE FROM pages WHERE key IN "
+                    "(SELECT key FROM pages ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_page_cache(path=PAGE_CACHE_PATH):
+    """This process's PageCache for `path`, or None if the cache is disabled."""
+    if not path:
+        return None
+    # SQLite connections must not cross a fork, so key on the process too
+    key = (os.getpid(), path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = PageCache(path)
+        return cache
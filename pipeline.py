@@ -0,0 +1,103 @@
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from chunking import aggregate_scores
+from embedding_engine import embed_query
+from ingest import stream_ingest
+from matching import normalize_rows
+from sessions import doc_id
+from utils4 import similar_docs
+
+# One progress update from run_screening. `ranking` is a list of
+# (Document, score) pairs: provisional during "embed", final on "done".
+Progress = namedtuple("Progress", "stage done total ranking")
+
+STAGES = ("parse", "embed", "upsert", "query")
+
+_FINISHED = object()
+
+
+class _ProvisionalRanking:
+    """Running top-k over the chunks embedded so far, scored against the query."""
+
+    def __init__(self, query_vector, k):
+        self.query = normalize_rows([query_vector])[0]
+        self.k = k
+        self.docs_by_id = {}
+        self.parents = []
+        self.scores = []
+
+    def add(self, docs, chunks, vectors):
+        # Only names are shown until the final ranking, so the text isn't kept
+        for doc in docs:
+            self.docs_by_id[doc_id(doc)] = Document(page_content="", metadata=doc.metadata)
+        self.scores.append(normalize_rows(vectors) @ self.query)
+        self.parents.extend(chunk.metadata["doc_id"] for chunk in chunks)
+        doc_ids, scores = aggregate_scores(self.parents, np.concatenate(self.scores))
+        return [(self.docs_by_id[doc_id], score) for doc_id, score in zip(doc_ids[: self.k], scores[: self.k].tolist())]
+
+
+def run_screening(pdf_files, job_description, k, unique_id, api_key, environment, index_name, embeddings,
+                  query_vector=None):
+    """Run extract -> embed -> upsert -> query, yielding Progress as each stage advances.
+
+    The work runs on a background thread and events are handed back through
+    a queue, so callers (e.g. the Streamlit script thread) can render each
+    update as it arrives. Ingest streams through stream_ingest, so progress
+    counts resumes and memory stays bounded however many files are
+    uploaded. The last event has stage "done" and the final ranking; an
+    exception in any stage is re-raised here. `query_vector`, e.g. an open
+    role's stored vector, saves embedding the job description.
+    """
+    events = queue.Queue()
+
+    def emit(stage, done, total, ranking=None):
+        events.put(Progress(stage, done, total, ranking))
+
+    def work():
+        vector = embed_query(embeddings, job_description) if query_vector is None else query_vector
+        provisional = _ProvisionalRanking(np.asarray(vector, dtype=np.float32), k)
+        parsed = [0]
+
+        def on_progress(stage, done, total, docs=None, chunks=None, vectors=None):
+            if stage == "parse":
+                parsed[0] = done
+            ranking = provisional.add(docs, chunks, vectors) if stage == "embed" else None
+            emit(stage, done, total, ranking)
+
+        stream_ingest(pdf_files, unique_id, api_key, environment, index_name, embeddings, on_progress=on_progress)
+
+        emit("query", 0, 1)
+        ranking = similar_docs(
+            query=job_description,
+            k=k,
+            api_key=api_key,
+            environment=environment,
+            index_name=index_name,
+            embeddings=embeddings,
+            unique_id=unique_id,
+            query_vector=vector
+        )
+        emit("query", 1, 1)
+        emit("done", parsed[0], parsed[0], ranking)
+
+    def run():
+        try:
+            work()
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(_FINISHED)
+
+    threading.Thread(target=run, name=f"screening-{unique_id}", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is _FINISHED:
+            return
+        if isinstance(event, BaseException):
+            raise event
+        yield event
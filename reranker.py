@@ -0,0 +1,103 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+# Cross-encoder for the optional second ranking stage, e.g.
+# "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables re-ranking.
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+# Resumes re-scored per query, and the time allowed for it.
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "1500"))
+# Best first-stage chunks of each resume paired with the job description.
+RERANK_CHUNKS_PER_DOC = int(os.getenv("RERANK_CHUNKS_PER_DOC", "2"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+
+
+def _pair_key(query, passage):
+    return hashlib.sha256(f"{query}\0{passage}".encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """Re-scores (job description, resume chunk) pairs with a CPU cross-encoder.
+
+    Pairs are scored in batches, best first-stage candidates first, until
+    `budget_ms` runs out; scores are cached per pair, so re-running a query
+    or sharing chunks across queries costs nothing.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._model = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+    def _cached(self, key):
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, keys, scores):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def score_pairs(self, query, passages, deadline=None):
+        """Cross-encoder score per passage, or None for those the deadline cut off."""
+        keys = [_pair_key(query, passage) for passage in passages]
+        scores = [self._cached(key) for key in keys]
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+        metrics.cache_lookup("rerank", len(passages) - len(missing), len(missing))
+        for start in range(0, len(missing), self.batch_size):
+            if deadline is not None and time.monotonic() >= deadline:
+                metrics.inc("resume_rerank_budget_exhausted_total", help="Re-rank calls cut short by their budget.")
+                break
+            batch = missing[start:start + self.batch_size]
+            predicted = self._get_model().predict(
+                [(query, passages[idx]) for idx in batch], batch_size=len(batch), show_progress_bar=False
+            )
+            predicted = np.asarray(predicted, dtype=np.float32).reshape(len(batch)).tolist()
+            self._store([keys[idx] for idx in batch], predicted)
+            for idx, score in zip(batch, predicted):
+                scores[idx] = score
+        return scores
+
+    def rerank(self, query, candidates, budget_ms=RERANK_BUDGET_MS):
+        """Re-order `candidates`, a best-first list of (doc_id, [chunk texts]).
+
+        Returns (doc_ids, scores, reranked): re-scored resumes come first,
+        ordered by their best chunk's cross-encoder score; any the budget
+        didn't reach follow in their original order with score None.
+        """
+        deadline = time.monotonic() + budget_ms / 1000 if budget_ms else None
+        passages = [text for _, texts in candidates for text in texts]
+        owners = [pos for pos, (_, texts) in enumerate(candidates) for _ in texts]
+        best = [None] * len(candidates)
+        for owner, score in zip(owners, self.score_pairs(query, passages, deadline)):
+            if score is not None and (best[owner] is None or score > best[owner]):
+                best[owner] = score
+        scored = sorted((pos for pos, score in enumerate(best) if score is not None), key=lambda pos: -best[pos])
+        unscored = [pos for pos, score in enumerate(best) if score is None]
+        order = scored + unscored
+        return [candidates[pos][0] for pos in order], [best[pos] for pos in order], len(scored)
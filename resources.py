@@ -0,0 +1,164 @@
+import os
+import threading
+
+# Heavy client libraries (sentence-transformers/torch, pinecone, langchain
+# chains) are imported inside the factories below, so importing this module
+# stays cheap and a cold start only pays for what the first request uses.
+from doc_store import DOC_STORE_PATH, DocStore
+from embedding_cache import EMBEDDING_CACHE_DIR, EmbeddingCache
+from embedding_engine import EMBEDDING_BACKEND, load_embeddings, model_key
+from lexical import LEXICAL_INDEX_DIR, LexicalIndex
+from open_roles import OPEN_ROLES_PATH, OpenRoles
+from reranker import RERANK_MODEL, CrossEncoderReranker
+from vector_store import LOCAL_INDEX_DIR, VECTOR_STORE, LocalIndex
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIMENSION = 384
+
+# One entry per warm resource, shared by every Streamlit session in the process.
+_resources = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _key_lock(key):
+    with _registry_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _get(key, factory):
+    """Return the cached resource for `key`, building it once on first use."""
+    resource = _resources.get(key)
+    if resource is not None:
+        return resource
+    # Per-key locks so a slow model load doesn't block Pinecone lookups.
+    with _key_lock(key):
+        resource = _resources.get(key)
+        if resource is None:
+            resource = factory()
+            _resources[key] = resource
+        return resource
+
+
+def get_embeddings(model_name=MODEL_NAME, backend=EMBEDDING_BACKEND):
+    """Return the process-wide embedding model on the EMBEDDING_BACKEND inference path."""
+    return _get(("embeddings", model_name, backend), lambda: load_embeddings(model_name, backend))
+
+
+def get_embedding_cache(model_name=MODEL_NAME):
+    """Return the process-wide on-disk embedding cache, or None if disabled."""
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    # Quantized backends' vectors differ slightly from fp32; keep them apart
+    cache_name = model_key(model_name)
+    return _get(("embedding_cache", cache_name), lambda: EmbeddingCache(cache_name))
+
+
+def get_doc_store():
+    """Return the process-wide store holding resume text by vector id."""
+    return _get(("doc_store", DOC_STORE_PATH), lambda: DocStore(DOC_STORE_PATH))
+
+
+def get_lexical_index():
+    """Return the process-wide BM25 index over resume text, or None if disabled."""
+    if not LEXICAL_INDEX_DIR:
+        return None
+    return _get(("lexical_index", LEXICAL_INDEX_DIR), lambda: LexicalIndex(LEXICAL_INDEX_DIR))
+
+
+def get_open_roles():
+    """Return the process-wide open roles store, or None if OPEN_ROLES_PATH is empty."""
+    if not OPEN_ROLES_PATH:
+        return None
+    return _get(("open_roles", OPEN_ROLES_PATH), lambda: OpenRoles(OPEN_ROLES_PATH))
+
+
+def get_reranker():
+    """Return the process-wide cross-encoder re-ranker, or None if RERANK_MODEL is unset."""
+    if not RERANK_MODEL:
+        return None
+    # The model itself loads on the first re-rank
+    return _get(("reranker", RERANK_MODEL), lambda: CrossEncoderReranker(RERANK_MODEL))
+
+
+def get_summary_service():
+    """Return the process-wide summarisation service (shared LLM chain and cache)."""
+    def load():
+        from summarizer import SummaryService
+
+        return SummaryService()
+
+    return _get(("summary_service",), load)
+
+
+def get_pinecone(api_key, environment):
+    """Return the process-wide Pinecone client for these credentials."""
+    def connect():
+        from pinecone import Pinecone
+
+        return Pinecone(api_key=api_key, environment=environment)
+
+    return _get(("pinecone", api_key, environment), connect)
+
+
+def get_index(api_key, environment, index_name):
+    """Return a cached Index handle, creating the index on first use if needed."""
+    def connect():
+        from pinecone import ServerlessSpec
+
+        pc = get_pinecone(api_key, environment)
+        if index_name not in pc.list_indexes().names():
+            pc.create_index(
+                name=index_name,
+                dimension=EMBEDDING_DIMENSION,
+                spec=ServerlessSpec(cloud="aws", region=environment)
+            )
+        return pc.Index(index_name)
+
+    return _get(("index", api_key, environment, index_name), connect)
+
+
+def get_vector_store(api_key, environment, index_name):
+    """Return the index selected by VECTOR_STORE: "pinecone" (default) or "local".
+
+    Both expose the same upsert/query/delete interface.
+    """
+    if VECTOR_STORE == "local":
+        path = os.path.join(LOCAL_INDEX_DIR, index_name or "default")
+        return _get(("local_index", path), lambda: LocalIndex(path))
+    return get_index(api_key, environment, index_name)
+
+
+def invalidate(kind=None):
+    """Drop cached resources so the next request rebuilds them.
+
+    `kind` is one of "embeddings", "embedding_cache", "doc_store",
+    "lexical_index", "open_roles", "reranker", "summary_service",
+    "pinecone", "index" or "local_index"; None drops everything.
+    Dropping "pinecone" also drops the Index handles that depend on it.
+    """
+    kinds = {kind, "index"} if kind == "pinecone" else {kind}
+    with _registry_lock:
+        for key in list(_resources):
+            if kind is None or key[0] in kinds:
+                del _resources[key]
+
+
+def warmup(background=False):
+    """Load the embedding model (and re-ranker) and connect to Pinecone ahead of the first request."""
+    def run():
+        embeddings = get_embeddings()
+        embeddings.embed_query("warmup")
+        reranker = get_reranker()
+        if reranker is not None:
+            reranker.score_pairs("warmup", ["warmup"])
+        api_key = os.getenv("PINECONE_API_KEY")
+        index_name = os.getenv("PINECONE_INDEX_NAME")
+        if VECTOR_STORE == "local" or (api_key and index_name):
+            get_vector_store(api_key, os.getenv("PINECONE_ENVIRONMENT"), index_name)
+
+    if background:
+        thread = threading.Thread(target=run, name="resource-warmup", daemon=True)
+        thread.start()
+        return thread
+    run()
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from langchain_core.documents import Document
+
+from extraction import read_pdf_bytes
+from pipeline import Progress
+
+# Base URL of server.py; when set, app4 submits single-role screenings there.
+SCREENING_SERVER_URL = os.getenv("SCREENING_SERVER_URL", "")
+SCREENING_POLL_INTERVAL = float(os.getenv("SCREENING_POLL_INTERVAL", "0.5"))
+SCREENING_TIMEOUT = float(os.getenv("SCREENING_TIMEOUT", "30"))
+
+
+def _multipart(fields, files):
+    """Encode form `fields` and (name, filename, bytes) `files` as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+        )
+    for name, filename, data in files:
+        filename = filename.replace('"', "%22")
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n".encode("utf-8") + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _request(url, data=None, content_type=None):
+    headers = {"Content-Type": content_type} if content_type else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers),
+                                    timeout=SCREENING_TIMEOUT) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e).get("error", e.reason)
+        except ValueError:
+            message = e.reason
+        if e.code == 503:
+            raise RuntimeError(f"The screening server is busy ({message}); please try again shortly.") from e
+        raise RuntimeError(f"Screening server error {e.code}: {message}") from e
+
+
+def submit_screening(server_url, pdf_files, job_description, k):
+    """Upload resumes and a job description to server.py; returns the job id."""
+    body, content_type = _multipart(
+        {"job_description": job_description, "k": k},
+        [("files", pdf_file.name, read_pdf_bytes(pdf_file)) for pdf_file in pdf_files],
+    )
+    return _request(f"{server_url.rstrip('/')}/jobs", body, content_type)["job_id"]
+
+
+def _documents(ranking):
+    return [(Document(page_content=item.get("page_content", ""), metadata=item["metadata"]), item["score"])
+            for item in ranking]
+
+
+def remote_screening(server_url, pdf_files, job_description, k, poll_interval=SCREENING_POLL_INTERVAL):
+    """Like pipeline.run_screening, but run by server.py: yields Progress from polling the job."""
+    job_id = submit_screening(server_url, pdf_files, job_description, k)
+    seen = {}
+    while True:
+        state = _request(f"{server_url.rstrip('/')}/jobs/{job_id}")
+        if state["status"] == "failed":
+            raise RuntimeError(state.get("error", "screening failed"))
+        if state["status"] == "done":
+            parsed = state["progress"].get("parse", {"done": 0})["done"]
+            yield Progress("done", parsed, parsed, _documents(state["ranking"]))
+            return
+        for stage, counts in state["progress"].items():
+            if seen.get(stage) != counts:
+                seen[stage] = counts
+                ranking = _documents(state["ranking"]) if stage == "embed" else None
+                yield Progress(stage, counts["done"], counts["total"], ranking)
+        time.sleep(poll_interval)
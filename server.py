@@ -0,0 +1,329 @@
+"""Screening backend shared by every recruiter's Streamlit session.
+
+    python server.py --port 8000
+    SCREENING_SERVER_URL=http://127.0.0.1:8000 streamlit run app4.py
+
+One process owns the embedding model. Screening jobs are queued and run on
+SERVER_JOB_WORKERS threads, and every embedding call they make goes through
+a shared pool that merges concurrent requests into dynamic batches. Clients
+POST /jobs (multipart: `files`, `job_description`, `k`), then poll
+GET /jobs/<id> until the status is "done" or "failed".
+
+The embedding cache, local vector index and BM25 index each take a single
+writer process, so the server keeps its own under SERVER_CACHE_DIR instead
+of sharing app4's `.cache` defaults; the SQLite stores (documents, pages,
+open roles) are shared.
+"""
+import argparse
+import itertools
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+from single_writer import use_own_directories
+
+SERVER_CACHE_DIR = os.getenv("SERVER_CACHE_DIR", ".cache/server")
+use_own_directories("SERVER", SERVER_CACHE_DIR)
+# Jobs screened at once; beyond SERVER_MAX_PENDING waiting jobs, new ones get a 503.
+SERVER_JOB_WORKERS = int(os.getenv("SERVER_JOB_WORKERS", "4"))
+SERVER_MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "32"))
+# Each running job parses on its own extraction pool, so they split the cores
+os.environ.setdefault("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 1) // SERVER_JOB_WORKERS)))
+
+import metrics
+import resources
+from embedding_engine import (
+    DEFAULT_MAX_BATCH_TOKENS, _encode, _max_seq_length, _sentence_model, estimate_tokens, plan_batches,
+)
+from extraction import LocalPDF
+from pipeline import run_screening
+
+# Texts per merged forward pass, and how long the first request in a batch
+# waits for others to join it.
+SERVER_MAX_BATCH = int(os.getenv("SERVER_MAX_BATCH", "64"))
+SERVER_BATCH_WAIT_MS = float(os.getenv("SERVER_BATCH_WAIT_MS", "5"))
+SERVER_EMBED_WORKERS = int(os.getenv("SERVER_EMBED_WORKERS", "1"))
+# Finished jobs are forgotten after this many seconds.
+SERVER_JOB_TTL = float(os.getenv("SERVER_JOB_TTL", "3600"))
+SERVER_MAX_UPLOAD_MB = float(os.getenv("SERVER_MAX_UPLOAD_MB", "512"))
+
+app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = int(SERVER_MAX_UPLOAD_MB * 2**20)
+
+
+class _EmbedRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class BatchingEmbeddings:
+    """One embedding model shared by concurrent jobs through dynamic batching.
+
+    `embed_documents` queues its texts and waits. A worker takes the oldest
+    request and keeps adding queued ones until SERVER_MAX_BATCH texts or
+    SERVER_BATCH_WAIT_MS have passed, then runs the merged texts through the
+    model in length-bucketed passes. embed_texts sends one micro-batch at a
+    time per caller, so a large upload interleaves with small jobs instead
+    of holding the model until it finishes.
+    """
+
+    def __init__(self, embeddings, workers=SERVER_EMBED_WORKERS, max_batch=SERVER_MAX_BATCH,
+                 max_wait_ms=SERVER_BATCH_WAIT_MS):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model_name", resources.MODEL_NAME)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._model = _sentence_model(embeddings)
+        self._requests = queue.Queue()
+        for number in range(workers):
+            threading.Thread(target=self._run, name=f"embed-pool-{number}", daemon=True).start()
+
+    def embed_documents(self, texts):
+        embed_request = _EmbedRequest(list(texts))
+        if not embed_request.texts:
+            return []
+        self._requests.put(embed_request)
+        return embed_request.future.result()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            count = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch:
+                try:
+                    embed_request = self._requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(embed_request)
+                count += len(embed_request.texts)
+            started = time.monotonic()
+            for embed_request in batch:
+                metrics.observe("resume_embed_queue_seconds", started - embed_request.queued_at,
+                                help="Time embedding requests waited for the shared pool.")
+            metrics.observe("resume_embed_batch_texts", count, help="Texts per merged embedding pass.")
+            try:
+                vectors = self._encode([text for embed_request in batch for text in embed_request.texts])
+            except Exception as e:
+                for embed_request in batch:
+                    embed_request.future.set_exception(e)
+                continue
+            offset = 0
+            for embed_request in batch:
+                rows = vectors[offset:offset + len(embed_request.texts)]
+                offset += len(embed_request.texts)
+                embed_request.future.set_result(rows.tolist())
+
+    def _encode(self, texts):
+        # Requests from different callers mix lengths; re-bucket so padding stays low
+        max_len = _max_seq_length(self._model)
+        lengths = [estimate_tokens(text, max_len) for text in texts]
+        matrix = None
+        for rows in plan_batches(lengths, self.max_batch, DEFAULT_MAX_BATCH_TOKENS):
+            vectors = _encode(self.embeddings, self._model, [texts[row] for row in rows])
+            if matrix is None:
+                matrix = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            matrix[rows] = vectors
+        return matrix
+
+
+class ServerBusy(Exception):
+    """Raised when SERVER_MAX_PENDING jobs are already waiting."""
+
+
+class _Job:
+    def __init__(self, job_id, sequence, files, job_description, k, directory):
+        self.id = job_id
+        self.sequence = sequence  # submission order, for queue positions
+        self.files = files
+        self.job_description = job_description
+        self.k = k
+        self.directory = directory
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.ranking = []
+        self.error = None
+
+
+def _ranking_json(ranking, text=False):
+    return [
+        {"metadata": doc.metadata, "score": float(score), **({"page_content": doc.page_content} if text else {})}
+        for doc, score in ranking or []
+    ]
+
+
+class JobQueue:
+    """Screening jobs run `workers` at a time on the shared embeddings."""
+
+    def __init__(self, embeddings, workers=SERVER_JOB_WORKERS, max_pending=SERVER_MAX_PENDING, ttl=SERVER_JOB_TTL):
+        self.embeddings = embeddings
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screening-job")
+        self._jobs = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, uploads, job_description, k):
+        """Queue a job for `uploads` ((filename, file object) pairs); returns its id."""
+        with self._lock:
+            self._expire()
+            pending = sum(job.status == "queued" for job in self._jobs.values())
+            if pending >= self.max_pending:
+                metrics.inc("resume_jobs_rejected_total", help="Screening jobs turned away while the queue was full.")
+                raise ServerBusy(f"{pending} screening jobs are already waiting")
+        job_id = uuid.uuid4().hex
+        # Uploads only live as long as the request, so each job gets its own copy on disk
+        directory = tempfile.mkdtemp(prefix=f"screening-{job_id}-")
+        files = []
+        for position, (filename, stream) in enumerate(uploads):
+            path = os.path.join(directory, f"{position:05d}.pdf")
+            with open(path, "wb") as f:
+                shutil.copyfileobj(stream, f)
+            pdf = LocalPDF(path)
+            pdf.name = filename
+            files.append(pdf)
+        with self._lock:
+            job = _Job(job_id, next(self._order), files, job_description, k, directory)
+            self._jobs[job_id] = job
+        metrics.inc("resume_jobs_submitted_total", help="Screening jobs accepted.")
+        self._executor.submit(self._run, job)
+        return job_id
+
+    def _run(self, job):
+        job.status, job.started_at = "running", time.time()
+        metrics.observe("resume_job_queue_seconds", job.started_at - job.submitted_at,
+                        help="Time screening jobs waited for a worker.")
+        try:
+            for event in run_screening(job.files, job.job_description, job.k, job.id, os.getenv("PINECONE_API_KEY"),
+                                       os.getenv("PINECONE_ENVIRONMENT"), os.getenv("PINECONE_INDEX_NAME"),
+                                       self.embeddings):
+                if event.stage == "done":
+                    job.ranking = _ranking_json(event.ranking, text=True)
+                    job.progress["parse"] = {"done": event.done, "total": event.total}
+                    break
+                job.progress[event.stage] = {"done": event.done, "total": event.total}
+                if event.ranking:
+                    job.ranking = _ranking_json(event.ranking)
+            job.status = "done"
+        except Exception as e:
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            metrics.inc("resume_jobs_failed_total", help="Screening jobs that raised.")
+        finally:
+            job.finished_at = time.time()
+            job.files = []
+            shutil.rmtree(job.directory, ignore_errors=True)
+            metrics.observe("resume_job_seconds", job.finished_at - job.submitted_at,
+                            help="Screening job latency from submission to result.")
+
+    def status(self, job_id):
+        """JSON-ready state of a job, or None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            ahead = sum(
+                other.status == "queued" and other.sequence < job.sequence for other in self._jobs.values()
+            )
+        state = {
+            "job_id": job.id,
+            "status": job.status,
+            "progress": job.progress,
+            "ranking": job.ranking,
+            "submitted_at": job.submitted_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+        if job.status == "queued":
+            state["queue_position"] = ahead + 1
+        if job.error is not None:
+            state["error"] = job.error
+        return state
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if (job.finished_at or time.time()) < cutoff]:
+            del self._jobs[job_id]
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """The process-wide job queue, with the embedding model behind the batching pool."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(BatchingEmbeddings(resources.get_embeddings()))
+        return _job_queue
+
+
+@app.post("/jobs")
+def submit_job():
+    files = request.files.getlist("files")
+    job_description = request.form.get("job_description", "").strip()
+    try:
+        k = int(request.form.get("k", "5"))
+    except ValueError:
+        k = 0
+    if not files or not job_description or k <= 0:
+        return jsonify({"error": "files, job_description and a positive k are required"}), 400
+    try:
+        job_id = get_job_queue().submit([(f.filename, f.stream) for f in files], job_description, k)
+    except ServerBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    state = get_job_queue().status(job_id)
+    if state is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(state)
+
+
+@app.get("/healthz")
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    metrics.configure_logging()
+    # Load the model before the first job rather than inside it
+    threading.Thread(target=get_job_queue, name="job-queue-warmup", daemon=True).start()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
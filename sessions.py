@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from vector_store import fetch_namespace
+
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "24"))
+SESSION_GC_INTERVAL = float(os.getenv("SESSION_GC_INTERVAL", "3600"))
+
+logger = logging.getLogger(__name__)
+
+_last_collection = {}
+_gc_lock = threading.Lock()
+
+
+def doc_id(doc):
+    """Stable, content-derived vector id for a resume."""
+    key = doc.metadata.get("content_hash") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    return f"doc-{key[:32]}"
+
+
+def _namespace_uploaded_at(index, namespace):
+    # Namespaces written before uploads were recorded: the newest vector decides
+    _, metadata, _ = fetch_namespace(index, namespace)
+    uploaded = [meta["uploaded_at"] for meta in metadata if meta.get("uploaded_at") is not None]
+    return max(uploaded) if uploaded else None
+
+
+def collect_expired_sessions(index, ttl_hours=SESSION_TTL_HOURS, now=None, doc_store=None, lexical_index=None,
+                             open_roles=None):
+    """Delete every session namespace with no upload in the last `ttl_hours`.
+
+    Returns the list of deleted namespaces. Each namespace's last upload is
+    read from `doc_store`, falling back to the newest `uploaded_at` in its
+    vector metadata, so this works across processes and machines sharing an
+    index. Resume text used only by expired namespaces is deleted from
+    `doc_store`, and they are dropped from `lexical_index`; those resumes
+    also leave the shortlists in `open_roles`, which needs `doc_store` to
+    tell them apart. The default namespace predates sessions and is never
+    touched.
+    """
+    now = time.time() if now is None else now
+    last_uploads = doc_store.last_uploads() if doc_store is not None else {}
+    namespaces = set(index.describe_index_stats().get("namespaces", {}))
+    expired = []
+    for namespace in sorted(namespaces | set(last_uploads)):
+        if not namespace:
+            continue
+        uploaded_at = last_uploads.get(namespace)
+        if uploaded_at is None:
+            uploaded_at = _namespace_uploaded_at(index, namespace)
+            if uploaded_at is not None and doc_store is not None:
+                doc_store.record_upload(namespace, uploaded_at)
+        if uploaded_at is None or now - uploaded_at <= ttl_hours * 3600:
+            continue
+        if namespace in namespaces:
+            index.delete(delete_all=True, namespace=namespace)
+        if lexical_index is not None:
+            lexical_index.delete(namespace)
+        if doc_store is not None:
+            deleted = doc_store.delete_namespace(namespace)
+            if open_roles is not None and deleted:
+                open_roles.discard(deleted)
+        expired.append(namespace)
+    if expired:
+        logger.info("Deleted %d expired session namespace(s).", len(expired))
+    return expired
+
+
+def maybe_collect_expired_sessions(index, key, doc_store=None, lexical_index=None, open_roles=None):
+    """Run collect_expired_sessions in the background at most once per SESSION_GC_INTERVAL."""
+    with _gc_lock:
+        now = time.monotonic()
+        if now - _last_collection.get(key, float("-inf")) < SESSION_GC_INTERVAL:
+            return None
+        _last_collection[key] = now
+
+    def run():
+        try:
+            collect_expired_sessions(index, doc_store=doc_store, lexical_index=lexical_index, open_roles=open_roles)
+        except Exception:
+            logger.exception("Session cleanup failed")
+
+    thread = threading.Thread(target=run, name="session-gc", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,62 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows); the check is skipped
+    fcntl = None
+
+# Environment variables naming the single-writer stores' directories, and
+# the subdirectory each gets under a process's own cache root.
+STORE_DIRECTORIES = (("EMBEDDING_CACHE_DIR", "embeddings"), ("LOCAL_INDEX_DIR", "local_index"),
+                     ("LEXICAL_INDEX_DIR", "lexical"))
+
+# Directories this process holds, mapped to their open lock files.
+_held = {}
+_held_lock = threading.Lock()
+
+
+class StoreInUse(RuntimeError):
+    """Raised when another process already writes to a store's directory."""
+
+
+def claim_directory(path):
+    """Take the writer lock on `path` for the life of this process.
+
+    EmbeddingCache, LocalIndex and LexicalIndex keep their state in process
+    memory and rewrite their files on flush, so two processes writing one
+    directory would silently overwrite each other's entries. Raises
+    StoreInUse if another process already holds `path`; claiming it again
+    from this process is a no-op.
+    """
+    if fcntl is None:
+        return
+    path = os.path.realpath(path)
+    with _held_lock:
+        if path in _held:
+            return
+        os.makedirs(path, exist_ok=True)
+        lock_file = open(os.path.join(path, ".writer.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise StoreInUse(
+                f"{path} is already used by another process; give each process its own directory"
+            ) from None
+        _held[path] = lock_file
+
+
+def use_own_directories(prefix, root):
+    """Point this process's single-writer stores at their own directories under `root`.
+
+    For processes that run next to app4 (server.py, batch_screen.py). Call
+    it before importing the stores' modules, which read their settings at
+    import. `<prefix>_<NAME>` overrides one directory, e.g.
+    SERVER_LOCAL_INDEX_DIR; a store disabled with an empty setting stays
+    disabled.
+    """
+    for name, directory in STORE_DIRECTORIES:
+        if os.environ.get(name) == "":
+            continue
+        os.environ[name] = os.getenv(f"{prefix}_{name}", os.path.join(root, directory))
@@ -0,0 +1,77 @@
+"""Minimal OpenAI-compatible completions server for offline runs.
+
+    python stub_openai.py --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub streamlit run app4.py
+
+Each completion echoes the first words of the text being summarised, so
+summaries are deterministic and cost nothing.
+"""
+import argparse
+import time
+
+from flask import Flask, jsonify, request
+
+SUMMARY_WORDS = 40
+
+app = Flask(__name__)
+
+
+def _fake_completion(prompt):
+    # Summarisation prompts wrap the text in quotes after a fixed instruction.
+    if prompt.count('"') >= 2:
+        prompt = prompt.split('"', 1)[1].rsplit('"', 1)[0]
+    return " ".join(prompt.split()[:SUMMARY_WORDS])
+
+
+def _usage(prompts, texts):
+    prompt_tokens = sum(len(p.split()) for p in prompts)
+    completion_tokens = sum(len(t.split()) for t in texts)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/completions")
+def completions():
+    body = request.get_json(force=True)
+    prompts = body.get("prompt", "")
+    prompts = prompts if isinstance(prompts, list) else [prompts]
+    texts = [_fake_completion(prompt) for prompt in prompts]
+    return jsonify({
+        "id": f"cmpl-stub-{time.time_ns()}",
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {"text": text, "index": idx, "logprobs": None, "finish_reason": "stop"}
+            for idx, text in enumerate(texts)
+        ],
+        "usage": _usage(prompts, texts),
+    })
+
+
+@app.post("/v1/chat/completions")
+def chat_completions():
+    body = request.get_json(force=True)
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    text = _fake_completion(prompt)
+    return jsonify({
+        "id": f"chatcmpl-stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+        ],
+        "usage": _usage([prompt], [text]),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    app.run(host=args.host, port=args.port, threaded=True)
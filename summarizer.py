@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+# Point at any OpenAI-compatible server, e.g. `python stub_openai.py` for offline runs.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+
+def _content_key(doc):
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class SummaryService:
+    """Summarises resumes with one shared map_reduce chain and a content-hash cache."""
+
+    def __init__(self, concurrency=SUMMARY_CONCURRENCY, cache_size=SUMMARY_CACHE_SIZE):
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+        self._chain = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_chain(self):
+        with self._lock:
+            if self._chain is None:
+                # Deferred: langchain's chain modules and the OpenAI client are slow to import
+                from langchain.chains.summarize import load_summarize_chain
+                from langchain_community.llms import OpenAI
+
+                kwargs = {"openai_api_base": OPENAI_BASE_URL} if OPENAI_BASE_URL else {}
+                llm = OpenAI(temperature=0, **kwargs)
+                self._chain = load_summarize_chain(llm, chain_type="map_reduce")
+            return self._chain
+
+    def _cached(self, key):
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+        metrics.cache_lookup("summary", summary is not None, summary is None)
+        return summary
+
+    def _store(self, key, summary):
+        with self._lock:
+            self._cache[key] = summary
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def summarize(self, doc):
+        """Summarise one resume, reusing a cached summary of identical text."""
+        key = _content_key(doc)
+        summary = self._cached(key)
+        if summary is None:
+            summary = self._get_chain().invoke({"input_documents": [doc]})["output_text"]
+            self._store(key, summary)
+        return summary
+
+    async def asummarize(self, doc, semaphore=None):
+        key = _content_key(doc)
+        summary = self._cached(key)
+        if summary is not None:
+            return summary
+        semaphore = semaphore or asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            result = await self._get_chain().ainvoke({"input_documents": [doc]})
+        summary = result["output_text"]
+        self._store(key, summary)
+        return summary
+
+    async def iter_summaries(self, docs):
+        """Summarise `docs` concurrently, yielding `(index, summary, error)` as each finishes."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(idx, doc):
+            try:
+                return idx, await self.asummarize(doc, semaphore), None
+            except Exception as e:
+                return idx, None, e
+
+        for next_done in asyncio.as_completed([run(idx, doc) for idx, doc in enumerate(docs)]):
+            yield await next_done
@@ -1,118 +1,464 @@
+import logging
 import os
-from pinecone import Pinecone, Index, ServerlessSpec
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import OpenAI
+import time
+import numpy as np
+# Only the lightweight Document class is imported here; pinecone, the
+# embedding model and the summarisation chain load on first use via resources.
+from langchain_core.documents import Document
 
+import metrics
+import resources
+import sessions
+from embedding_engine import embed_query, embed_texts
+from chunking import CHUNK_OVERSAMPLE, RESUME_AGGREGATE, aggregate_scores, chunk_docs
+from dedup import DEDUP_RESUMES, find_duplicates
+from embedding_cache import content_hash
+from extraction import get_pdf_text, iter_pdf_texts, read_pdf_bytes
+from lexical import HYBRID_FUSION, LEXICAL_PREFILTER, fuse_rankings
+from matching import group_chunks, normalize_rows, resume_score_matrix, top_k_per_row
+from reranker import RERANK_BUDGET_MS, RERANK_CANDIDATES, RERANK_CHUNKS_PER_DOC
+from vector_store import fetch_namespace, upsert_in_batches
 
-from langchain_community.llms import OpenAI
-from langchain.schema import Document
-from pypdf import PdfReader
-from langchain.chains.summarize import load_summarize_chain
+__all__ = [
+    "collapse_duplicates",
+    "create_docs",
+    "create_embeddings_load_data",
+    "embed_docs",
+    "get_pdf_text",
+    "get_summary",
+    "initialize_pinecone",
+    "iter_docs",
+    "iter_summaries",
+    "prepare_upload",
+    "push_to_pinecone",
+    "similar_docs",
+    "similar_docs_multi",
+    "split_job_descriptions",
+    "store_upload",
+]
 
-def get_pdf_text(pdf_doc):
-    """Extract text from a PDF file."""
-    text = ""
-    pdf_reader = PdfReader(pdf_doc)
-    for page in pdf_reader.pages:
-        text += page.extract_text() or ""
-    return text
+logger = logging.getLogger(__name__)
 
+def _make_doc(pdf_file, text, content_hash, unique_id):
+    return Document(
+        page_content=text,
+        metadata={
+            "name": pdf_file.name,
+            "size": pdf_file.size,
+            "unique_id": unique_id,
+            "content_hash": content_hash
+        }
+    )
+
+def iter_docs(user_pdf_list, unique_id):
+    """Yield (position, document) pairs for uploaded PDFs as extraction finishes."""
+    cache = resources.get_embedding_cache()
+
+    # Resumes seen before skip pypdf entirely
+    misses = []
+    for position, pdf_file in enumerate(user_pdf_list):
+        key = content_hash(read_pdf_bytes(pdf_file))
+        text = cache.get_text(key) if cache is not None else None
+        if text is None:
+            misses.append((position, pdf_file, key))
+        else:
+            metrics.inc("resume_documents_total", help="Resumes turned into documents.")
+            yield position, _make_doc(pdf_file, text, key, unique_id)
+    if cache is not None:
+        metrics.cache_lookup("text", len(user_pdf_list) - len(misses), len(misses))
+
+    try:
+        for idx, pdf_file, text, error in iter_pdf_texts([pdf_file for _, pdf_file, _ in misses]):
+            position, _, key = misses[idx]
+            if error is not None:
+                metrics.inc("resume_extraction_errors_total", help="PDFs skipped because extraction failed.")
+                logger.warning("Skipping %s: %s", pdf_file.name, error)
+                continue
+            if cache is not None:
+                cache.put_text(key, text)
+            metrics.inc("resume_documents_total", help="Resumes turned into documents.")
+            yield position, _make_doc(pdf_file, text, key, unique_id)
+    finally:
+        if cache is not None:
+            cache.flush()
+
+@metrics.timed("create_docs")
 def create_docs(user_pdf_list, unique_id):
     """Create documents from uploaded PDFs."""
-    docs = []
-    for pdf_file in user_pdf_list:
-        text = get_pdf_text(pdf_file)
-        docs.append(Document(
-            page_content=text,
-            metadata={
-                "name": pdf_file.name,
-                "size": pdf_file.size,
-                "unique_id": unique_id
-            }
-        ))
-    print(docs)  # This should show Document objects, not dictionaries.
+    # Extraction finishes out of order; keep the upload order.
+    docs = [doc for _, doc in sorted(iter_docs(user_pdf_list, unique_id), key=lambda item: item[0])]
+    logger.debug("Created %d documents", len(docs))
+    for doc in docs:
+        metrics.log_sampled(logger, logging.DEBUG, "Document %s: %d chars", doc.metadata["name"], len(doc.page_content))
     return docs
 
 def create_embeddings_load_data():
-    """Create an instance of HuggingFace embeddings."""
-    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    """Return the shared HuggingFace embeddings instance."""
+    return resources.get_embeddings()
 
 def initialize_pinecone(api_key, environment):
-    """Return a Pinecone instance."""
-    return Pinecone(api_key=api_key, environment=environment)
-
-def push_to_pinecone(api_key, environment, index_name, embeddings, docs):
-    """Push document embeddings to Pinecone."""
-    pc = initialize_pinecone(api_key, environment)
-
-    # Check if the index exists, create if necessary
-    if index_name not in pc.list_indexes().names():
-        pc.create_index(
-            name=index_name,
-            dimension=384,  # Dimension must match embedding model
-            spec=ServerlessSpec(cloud="aws", region=environment)
-        )
-
-    # Access the index
-    index = pc.Index(index_name)
-
-    # Prepare vectors for upsert
-    vectors = [
+    """Return the shared Pinecone instance."""
+    return resources.get_pinecone(api_key, environment)
+
+@metrics.timed("embed_docs")
+def embed_docs(embeddings, docs, on_batch=None, known=None):
+    """Embed documents, reusing cached vectors for resumes embedded before.
+
+    `on_batch(rows, vectors)` is called for the cache hits and then after
+    each embedding batch, with indices into `docs`. `known` maps content
+    hashes to vectors already computed in this process.
+    """
+    cache = resources.get_embedding_cache(getattr(embeddings, "model_name", resources.MODEL_NAME))
+    keys = [doc.metadata.get("content_hash") for doc in docs]
+    cached = cache.get_vectors(keys) if cache is not None else [None] * len(docs)
+    if known:
+        cached = [known.get(key) if vector is None else vector for key, vector in zip(keys, cached)]
+
+    hits = [idx for idx, vector in enumerate(cached) if vector is not None]
+    if cache is not None:
+        metrics.cache_lookup("embedding", len(hits), len(docs) - len(hits))
+    if on_batch is not None and hits:
+        on_batch(hits, np.stack([cached[idx] for idx in hits]))
+
+    missing = [idx for idx, vector in enumerate(cached) if vector is None]
+    fresh = embed_texts(
+        embeddings,
+        [docs[idx].page_content for idx in missing],
+        on_batch=None if on_batch is None else lambda rows, vectors: on_batch([missing[row] for row in rows], vectors)
+    )
+    if cache is not None and missing:
+        for idx in missing:
+            if keys[idx] is not None and keys[idx] not in cache:
+                cache.put_text(keys[idx], docs[idx].page_content)
+        cache.put_vectors([keys[idx] for idx in missing], fresh)
+
+    if not missing:
+        return np.ascontiguousarray(np.stack(cached)) if cached else fresh
+    matrix = np.empty((len(docs), fresh.shape[1]), dtype=np.float32)
+    matrix[missing] = fresh
+    for idx, vector in enumerate(cached):
+        if vector is not None:
+            matrix[idx] = vector
+    return matrix
+
+def collapse_duplicates(embeddings, docs, known=None):
+    """Drop near-duplicate resumes, keeping the first upload of each.
+
+    Candidates come from MinHash + LSH over the text and are confirmed by
+    the cosine of their mean chunk embeddings. Each kept document lists the
+    file names it absorbed under metadata["duplicates"]. Chunk vectors
+    computed on the way are added to `known` (content hash -> vector) so
+    the kept resumes aren't embedded twice.
+    """
+    def embed_rows(rows):
+        chunks = chunk_docs([docs[row] for row in rows], rows)
+        matrix = embed_docs(embeddings, chunks, known=known)
+        if known is not None:
+            known.update(zip((chunk.metadata["content_hash"] for chunk in chunks), matrix))
+        owners = np.array([chunk.metadata["doc_id"] for chunk in chunks])
+        return normalize_rows(np.stack([matrix[owners == row].mean(axis=0) for row in rows]))
+
+    with metrics.span("dedup"):
+        duplicates = find_duplicates([doc.page_content for doc in docs], embed_rows)
+    if not duplicates:
+        return docs
+    metrics.inc("resume_duplicates_total", len(duplicates), help="Near-duplicate resumes collapsed at ingest.")
+    absorbed = {}
+    for row, kept in sorted(duplicates.items()):
+        absorbed.setdefault(kept, []).append(docs[row].metadata["name"])
+    logger.info("Collapsed %d near-duplicate resumes.", len(duplicates))
+    kept_docs = []
+    for row, doc in enumerate(docs):
+        if row in duplicates:
+            continue
+        if row in absorbed:
+            doc = Document(page_content=doc.page_content, metadata={**doc.metadata, "duplicates": absorbed[row]})
+        kept_docs.append(doc)
+    return kept_docs
+
+def prepare_upload(embeddings, docs, on_batch=None):
+    """Collapse duplicates, chunk and embed one batch of resumes for `store_upload`.
+
+    Returns (docs, ids, chunks, matrix) for the resumes that survived
+    dedup. `on_batch(chunks, vectors, total)` is called after each
+    embedding batch with its chunks and the batch's total chunk count.
+    """
+    # Re-submitted resumes are collapsed before any embedding or upsert work
+    known = {}
+    if DEDUP_RESUMES:
+        docs = collapse_duplicates(embeddings, docs, known)
+
+    # Split resumes into token-bounded chunks so nothing past MiniLM's
+    # 256-piece window is silently dropped
+    ids = [sessions.doc_id(doc) for doc in docs]
+    chunks = chunk_docs(docs, ids)
+
+    # Embed all chunks in length-bucketed batches, skipping cached ones and
+    # those already embedded to confirm duplicates
+    def embedded(rows, vectors):
+        on_batch([chunks[row] for row in rows], vectors, len(chunks))
+
+    matrix = embed_docs(embeddings, chunks, on_batch=embedded if on_batch else None, known=known)
+    return docs, ids, chunks, matrix
+
+def store_upload(index, namespace, docs, ids, chunks, matrix, embeddings, on_batch=None, flush=True):
+    """Save a batch from `prepare_upload` and upsert its vectors; returns the number upserted.
+
+    Once indexed, the batch is merged into the shortlists of the open roles
+    embedded with `embeddings`' model. With `flush` False a local index is
+    left for the caller to flush.
+    """
+    chunk_ids = [f"{chunk.metadata['doc_id']}#{chunk.metadata['chunk']}" for chunk in chunks]
+
+    # Resume and chunk text go to the local doc store; vectors carry only small metadata
+    doc_store = resources.get_doc_store()
+    doc_store.put_many(zip(ids, (doc.page_content for doc in docs)), namespace=namespace)
+    doc_store.put_many(zip(chunk_ids, (chunk.page_content for chunk in chunks)), namespace=namespace)
+    lexical = resources.get_lexical_index()
+    if lexical is not None:
+        lexical.add(ids, [doc.page_content for doc in docs], namespace=namespace)
+
+    # Ids are content-derived, so re-uploads overwrite instead of duplicating
+    uploaded_at = int(time.time())
+    vectors = (
     {
-        "id": f"doc-{idx}",
-        "values": embeddings.embed_query(doc.page_content),
-        "metadata": {"page_content": doc.page_content, **doc.metadata}
+        "id": chunk_ids[idx],
+        "values": matrix[idx].tolist(),
+        "metadata": {"uploaded_at": uploaded_at, **chunk.metadata}
     }
-    for idx, doc in enumerate(docs)
-    ]
+    for idx, chunk in enumerate(chunks)
+    )
+
+    # Upsert into the session's namespace in size-bounded concurrent batches
+    with metrics.span("upsert"):
+        count = upsert_in_batches(index, vectors, namespace=namespace, on_batch=on_batch, flush=flush)
+    open_roles = resources.get_open_roles()
+    if open_roles is not None:
+        open_roles.score(docs, ids, chunks, matrix, embeddings)
+    return count
+
+@metrics.timed("push_to_pinecone")
+def push_to_pinecone(api_key, environment, index_name, embeddings, docs, on_progress=None):
+    """Push document embeddings to Pinecone, one namespace per session.
 
-    for idx, doc in enumerate(docs):
-        print(f"Doc {idx}: {type(doc)} - {doc}")
+    `on_progress(stage, done, total, **details)` reports "embed" batches
+    (with the batch's `chunks` and `vectors`) and acknowledged "upsert"
+    batches. For uploads too large to hold at once, see ingest.stream_ingest.
+    """
+    # Cached handle (Pinecone or local); created on first use if it doesn't exist
+    index = resources.get_vector_store(api_key, environment, index_name)
+    sessions.maybe_collect_expired_sessions(
+        index, (api_key, index_name), resources.get_doc_store(), resources.get_lexical_index(),
+        resources.get_open_roles())
+    namespace = docs[0].metadata.get("unique_id", "") if docs else ""
 
-    if isinstance(doc, dict):
-        page_content = doc.get("page_content", "")
-    else:
-        page_content = doc.page_content
+    progress = {"embed": 0, "upsert": 0, "total": 0}
 
-    print(type(doc))  # Should be <class 'langchain.schema.Document'>
+    def embedded(chunks, vectors, total):
+        progress["embed"] += len(chunks)
+        progress["total"] = total
+        on_progress("embed", progress["embed"], total, chunks=chunks, vectors=vectors)
 
-    # Debugging log
-    print(f"Upserting the following vectors:\n{vectors}")
-    
+    def upserted(count):
+        progress["upsert"] += count
+        on_progress("upsert", progress["upsert"], progress["total"])
 
-    # Upsert vectors into the index
-    index.upsert(vectors)
-    print("Upsert completed.")
+    docs, ids, chunks, matrix = prepare_upload(embeddings, docs, on_batch=embedded if on_progress else None)
+    progress["total"] = len(chunks)
+    count = store_upload(index, namespace, docs, ids, chunks, matrix, embeddings,
+                         on_batch=upserted if on_progress else None)
+    logger.info("Upsert completed: %d vectors.", count)
 
-def similar_docs(query, k, api_key, environment, index_name, embeddings, unique_id):
-    pc = initialize_pinecone(api_key, environment)
-    index = pc.Index(index_name)
+@metrics.timed("similar_docs")
+def similar_docs(query, k, api_key, environment, index_name, embeddings, unique_id, aggregate=RESUME_AGGREGATE,
+                 search_params=None, fusion=HYBRID_FUSION, rerank_candidates=RERANK_CANDIDATES,
+                 rerank_budget_ms=RERANK_BUDGET_MS, query_vector=None):
+    """Rank the session's resumes against `query`; returns (Document, score) pairs.
+
+    `search_params` is passed through to the index's query, e.g.
+    `{"nprobe": 64, "rerank": 8}` to trade latency for recall on a large
+    local index. The score is always the resume's cosine similarity. With
+    `fusion` "rrf" or "weighted", BM25 matches on the resume text are fused
+    into the ranking, which then follows the fused value, kept in the
+    Document's `fused_score` metadata. When RERANK_MODEL is set, the best
+    `rerank_candidates` resumes are re-scored with the cross-encoder within
+    `rerank_budget_ms` and ranked first by its relevance score, kept in
+    `rerank_score` metadata; any the budget didn't reach follow in their
+    first-stage order, without one.
+    Pass `query_vector` (e.g. an open role's stored vector) to skip
+    embedding `query`.
+    """
+    index = resources.get_vector_store(api_key, environment, index_name)
+    lexical = resources.get_lexical_index()
+    fusion = fusion if lexical is not None else "off"
+    reranker = resources.get_reranker() if rerank_candidates else None
+    # Cheap first stage over a wider set when the cross-encoder narrows it down
+    depth = max(k, rerank_candidates) if reranker is not None else k
 
     # Generate query vector
-    query_vector = embeddings.embed_query(query)
+    if query_vector is None:
+        query_vector = embed_query(embeddings, query)
+    query_vector = np.asarray(query_vector, dtype=np.float32).tolist()
+
+    # BM25 over the session's resume text, for fusion and/or prefiltering
+    lexical_ids, lexical_scores = [], []
+    if lexical is not None and (fusion != "off" or LEXICAL_PREFILTER):
+        lexical_ids, lexical_scores = lexical.search(
+            query, max(depth * CHUNK_OVERSAMPLE, LEXICAL_PREFILTER), namespace=unique_id)
+    query_kwargs = dict(search_params or {})
+    if LEXICAL_PREFILTER and lexical_ids and lexical.count(unique_id) > LEXICAL_PREFILTER:
+        query_kwargs["filter"] = {"doc_id": {"$in": lexical_ids[:LEXICAL_PREFILTER]}}
 
-    # Fetch results
+    # Fetch enough chunks from this session's namespace to cover the candidates
     results = index.query(
         vector=query_vector,
-        top_k=k,
-        include_metadata=True
+        top_k=depth * CHUNK_OVERSAMPLE,
+        namespace=unique_id,
+        include_metadata=True,
+        **query_kwargs
     )
+    matches = results.get("matches", [])
+
+    # Strong lexical matches the vector search missed still need chunk scores
+    if fusion != "off":
+        seen = {match["metadata"].get("doc_id", match["id"]) for match in matches}
+        missing = [doc_id for doc_id in lexical_ids[:depth] if doc_id not in seen]
+        if missing:
+            matches = matches + index.query(
+                vector=query_vector,
+                top_k=len(missing) * CHUNK_OVERSAMPLE,
+                namespace=unique_id,
+                include_metadata=True,
+                filter={"doc_id": {"$in": missing}}
+            ).get("matches", [])
+    if not matches:
+        return []
+
+    # Rank resumes by their chunk scores (max or top-n mean)
+    parents = [match["metadata"].get("doc_id", match["id"]) for match in matches]
+    doc_ids, scores = aggregate_scores(parents, [match["score"] for match in matches], method=aggregate)
+    # The cosine stays the displayed score; later stages only re-order
+    cosine = dict(zip(doc_ids, scores.tolist()))
+    stage_scores = {}
+
+    best_match = {}
+    for parent, match in zip(parents, matches):
+        best_match.setdefault(parent, match)
+
+    if fusion != "off":
+        doc_ids, fused = fuse_rankings(doc_ids, scores, lexical_ids, lexical_scores, method=fusion)
+        keep = [pos for pos, doc_id in enumerate(doc_ids) if doc_id in best_match]
+        doc_ids = [doc_ids[pos] for pos in keep]
+        for doc_id, score in zip(doc_ids, np.asarray(fused)[keep].tolist()):
+            stage_scores.setdefault(doc_id, {})["fused_score"] = score
+    doc_ids = doc_ids[:depth]
+    if reranker is not None:
+        doc_ids, rerank_scores = _rerank(reranker, query, doc_ids, matches, parents, rerank_budget_ms)
+        for doc_id, score in zip(doc_ids, rerank_scores):
+            if score is not None:
+                stage_scores.setdefault(doc_id, {})["rerank_score"] = score
+    doc_ids = doc_ids[:k]
+    texts = resources.get_doc_store().get_many(doc_ids)
 
     documents = []
-    for match in results.get("matches", []):
-        metadata = match["metadata"]
-        page_content = metadata.pop("page_content", "")  # Remove if exists
-        documents.append((Document(page_content=page_content, metadata=metadata), match["score"]))
+    for doc_id in doc_ids:
+        metadata = dict(best_match[doc_id]["metadata"])
+        # Older vectors still carry their text in metadata
+        page_content = metadata.pop("page_content", None) or texts.get(doc_id, "")
+        for key in ("uploaded_at", "chunk", "content_hash"):
+            metadata.pop(key, None)
+        metadata.update(stage_scores.get(doc_id, {}))
+        documents.append((Document(page_content=page_content, metadata=metadata), cosine[doc_id]))
 
     return documents
 
-    print(f"Query Results: {results}")
-    return [(match["metadata"], match["score"]) for match in results.get("matches", [])]
+def _rerank(reranker, query, doc_ids, matches, parents, budget_ms):
+    """Second stage: re-score each candidate's best chunks against `query` with the cross-encoder.
+
+    Returns (doc_ids, scores): re-scored candidates first, best first, then
+    any the budget didn't reach in their original order with score None.
+    """
+    chunk_ids = {}
+    for parent, match in sorted(zip(parents, matches), key=lambda pair: -pair[1]["score"]):
+        ids = chunk_ids.setdefault(parent, [])
+        if len(ids) < RERANK_CHUNKS_PER_DOC:
+            ids.append(match["id"])
+    texts = resources.get_doc_store().get_many(
+        [chunk_id for doc_id in doc_ids for chunk_id in chunk_ids[doc_id]])
+    candidates = [
+        (doc_id, [texts[chunk_id] for chunk_id in chunk_ids[doc_id] if chunk_id in texts])
+        for doc_id in doc_ids
+    ]
+    with metrics.span("rerank"):
+        ranked, rerank_scores, _ = reranker.rerank(query, candidates, budget_ms=budget_ms)
+    return ranked, rerank_scores
+
+def split_job_descriptions(text):
+    """Split pasted text into job descriptions on lines containing only `---`."""
+    blocks, current = [], []
+    for line in text.splitlines():
+        if line.strip() == "---":
+            blocks.append("\n".join(current))
+            current = []
+        else:
+            current.append(line)
+    blocks.append("\n".join(current))
+    return [block.strip() for block in blocks if block.strip()]
 
+@metrics.timed("similar_docs_multi")
+def similar_docs_multi(queries, k, api_key, environment, index_name, embeddings, unique_id,
+                       aggregate=RESUME_AGGREGATE, roles_per_candidate=3):
+    """Match several job descriptions against a session's resumes in one pass.
 
+    All queries are embedded in one batch and scored against every resume
+    chunk in the session with a single (roles x resumes) matrix product.
+    Returns `(per_role, best_fit)`: per_role[i] is the top-k
+    (Document, score) list for queries[i]; best_fit is a list of
+    (Document, [(role index, score), ...]) with each candidate's best roles,
+    ordered by their best score.
+    """
+    index = resources.get_vector_store(api_key, environment, index_name)
+    ids, metadata, vectors = fetch_namespace(index, unique_id)
+    if not ids:
+        return [[] for _ in queries], []
+
+    # Group chunks per resume into contiguous runs
+    parents = [meta.get("doc_id", vector_id) for vector_id, meta in zip(ids, metadata)]
+    order, starts = group_chunks(parents, [meta.get("chunk", 0) for meta in metadata])
+    doc_ids = [parents[order[pos]] for pos in starts]
+
+    query_vectors = embed_texts(embeddings, queries)
+    scores = resume_score_matrix(query_vectors, vectors[order], starts, method=aggregate)
+
+    texts = resources.get_doc_store().get_many(doc_ids)
+    documents = []
+    for pos, doc_id in zip(starts, doc_ids):
+        meta = dict(metadata[order[pos]])
+        for key in ("uploaded_at", "chunk", "content_hash", "page_content"):
+            meta.pop(key, None)
+        documents.append(Document(page_content=texts.get(doc_id, ""), metadata=meta))
+
+    top, top_scores = top_k_per_row(scores, k)
+    per_role = [
+        [(documents[col], score) for col, score in zip(cols.tolist(), row_scores.tolist())]
+        for cols, row_scores in zip(top, top_scores)
+    ]
+
+    roles, role_scores = top_k_per_row(scores.T, roles_per_candidate)
+    best_fit = [
+        (documents[col], list(zip(roles[col].tolist(), role_scores[col].tolist())))
+        for col in np.argsort(-role_scores[:, 0], kind="stable").tolist()
+    ]
+    return per_role, best_fit
+
+
+@metrics.timed("get_summary")
 def get_summary(current_doc):
-    llm = OpenAI(temperature=0)
-    chain = load_summarize_chain(llm, chain_type="map_reduce")
-    return chain.run([current_doc])  # Pass current_doc directly.
+    """Summarise one resume with the shared, cached summarisation chain."""
+    return resources.get_summary_service().summarize(current_doc)
+
+async def iter_summaries(docs):
+    """Summarise resumes concurrently, yielding (index, summary, error) as each finishes."""
+    async for result in resources.get_summary_service().iter_summaries(docs):
+        yield result
 
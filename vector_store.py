@@ -0,0 +1,604 @@
+import atexit
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import ann
+import metrics
+from single_writer import claim_directory
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".cache/local_index")
+
+# Pinecone caps requests at 2 MB and 1000 vectors; stay well inside both.
+UPSERT_BATCH_VECTORS = int(os.getenv("UPSERT_BATCH_VECTORS", "100"))
+UPSERT_BATCH_BYTES = int(os.getenv("UPSERT_BATCH_BYTES", str(1_500_000)))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", "3"))
+
+# Storage for LocalIndex vectors: "float32", "float16" (2x smaller) or
+# "int8" (4x smaller) in RAM. Compressed namespaces re-rank
+# LOCAL_INDEX_RERANK x top_k candidates against float32 rows that live only
+# in a memory-mapped file on disk, so disk use grows rather than shrinks;
+# 0 drops those rows.
+_PRECISIONS = ("float32", "float16", "int8")
+LOCAL_INDEX_PRECISION = os.getenv("LOCAL_INDEX_PRECISION", "float32")
+LOCAL_INDEX_RERANK = int(os.getenv("LOCAL_INDEX_RERANK", "4"))
+_SCORE_BLOCK_ROWS = 8192
+
+# Namespaces with at least LOCAL_INDEX_ANN_MIN_VECTORS rows get an IVF
+# index (LOCAL_INDEX_NLIST lists, 0 for ~2*sqrt(n)) and each query scans
+# only the LOCAL_INDEX_NPROBE nearest lists; smaller ones are scanned exactly.
+LOCAL_INDEX_ANN_MIN_VECTORS = int(os.getenv("LOCAL_INDEX_ANN_MIN_VECTORS", "50000"))
+LOCAL_INDEX_NLIST = int(os.getenv("LOCAL_INDEX_NLIST", "0"))
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "64"))
+# Retrain once a namespace outgrows the sample its centroids were fit on by this factor.
+_ANN_RETRAIN_GROWTH = 4
+_ANN_TRAIN_SAMPLE_PER_LIST = 64
+
+# Stand-in for the unnamed namespace on disk.
+_DEFAULT_NAMESPACE = "__default__"
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _matches_filter(metadata, filter):
+    """Evaluate the subset of Pinecone's metadata filter language we use."""
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op == "$lt" and not (value is not None and value < operand):
+                return False
+            if op == "$gte" and not (value is not None and value >= operand):
+                return False
+    return True
+
+
+def _encode(vectors, precision):
+    """Compress unit-norm float32 rows to `precision`; returns (codes, per-row scales or None)."""
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        # Symmetric per-row scalar quantization: row ~= codes * scale
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return vectors, None
+
+
+def _grown(capacity, rows_needed):
+    """Capacity for at least `rows_needed` rows, growing by half so appends stay amortised O(1)."""
+    return max(rows_needed, capacity + capacity // 2, 64)
+
+
+def _map_rows(path, rows, dimension):
+    """Writable float32 (rows x dimension) memmap over the raw file at `path`, extended as needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = rows * dimension * 4
+    with open(path, "ab") as f:
+        if os.path.getsize(path) < size:
+            f.truncate(size)
+    return np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, dimension))
+
+
+def _is_in_filter(filter):
+    """True for a single-field `{"field": {"$in": [...]}}` filter."""
+    if not filter or len(filter) != 1:
+        return False
+    condition = next(iter(filter.values()))
+    return isinstance(condition, dict) and list(condition) == ["$in"]
+
+
+class _Namespace:
+    """Row-aligned ids, metadata and unit-norm vectors for one namespace.
+
+    `vectors` holds the searchable codes in `precision` ("float32",
+    "float16" or int8 with a float32 scale per row in `scales`). For
+    compressed namespaces, `full` keeps the float32 rows for the exact
+    re-rank in a memmap over `full_path`, or is None when re-ranking is
+    disabled; it is written in place and grown on disk, never copied into
+    RAM, so only the pages a re-rank touches are read. Once trained, the IVF
+    index is `centroids` plus the row-aligned list id of every row in
+    `assign`, kept current on upsert and delete.
+    """
+
+    def __init__(self, ids=None, metadata=None, vectors=None, precision="float32", scales=None, full=None,
+                 full_path=None, keep_full=False, centroids=None, assign=None, trained_count=0):
+        self.ids = ids or []
+        self.metadata = metadata or []
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self.precision = precision
+        self.vectors = vectors  # may be a read-only memmap until first write
+        self.scales = scales
+        self.full = full
+        self.full_path = full_path
+        self.keep_full = keep_full or full is not None
+        self.centroids = centroids
+        self.assign = assign
+        self.trained_count = trained_count
+        self._lists = None  # InvertedLists, rebuilt after changes
+        self._field_rows = {}  # metadata field -> {value: [rows]}, rebuilt after changes
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def matrix(self):
+        return self.vectors[: len(self.ids)]
+
+    def decoded(self, rows=slice(None)):
+        """float32 copy of `rows` (default all; exact when full-precision rows are kept)."""
+        rows = np.arange(len(self.ids))[rows]
+        if self.full is not None:
+            return np.array(self.full[rows])
+        matrix = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            matrix = matrix * self.scales[rows, None]
+        return matrix
+
+    def scores(self, query, rows=None):
+        """Approximate cosine scores of every row (or just `rows`), a block of rows at a time."""
+        if rows is not None:
+            scores = self.vectors[rows].astype(np.float32, copy=False) @ query
+            return scores * self.scales[rows] if self.scales is not None else scores
+        count = len(self.ids)
+        if self.precision == "float32":
+            return self.vectors[:count] @ query
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _SCORE_BLOCK_ROWS):
+            stop = min(start + _SCORE_BLOCK_ROWS, count)
+            scores[start:stop] = self.vectors[start:stop].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[:count]
+        return scores
+
+    def maybe_train(self, min_vectors, nlist=0):
+        """Fit IVF centroids once the namespace reaches `min_vectors` or outgrows its last fit."""
+        count = len(self.ids)
+        if count < max(min_vectors, 1):
+            return
+        if self.centroids is not None and count <= _ANN_RETRAIN_GROWTH * self.trained_count:
+            return
+        nlist = nlist or ann.default_nlist(count)
+        rng = np.random.default_rng(count)
+        sample = np.sort(rng.choice(count, min(count, nlist * _ANN_TRAIN_SAMPLE_PER_LIST), replace=False))
+        self.centroids = ann.train_centroids(self.decoded(sample), nlist)
+        self.trained_count = count
+        self.assign = np.empty(self.vectors.shape[0], dtype=np.int32)
+        for start in range(0, count, _SCORE_BLOCK_ROWS):
+            stop = min(start + _SCORE_BLOCK_ROWS, count)
+            self.assign[start:stop] = ann.assign_lists(self.decoded(slice(start, stop)), self.centroids)
+        self._lists = None
+        self.dirty = True
+
+    def probe(self, query, nprobe):
+        """Rows in the `nprobe` IVF lists nearest `query`, or None to scan every row."""
+        if self.centroids is None or nprobe <= 0 or nprobe >= len(self.centroids):
+            return None
+        if self._lists is None:
+            self._lists = ann.InvertedLists(self.assign[: len(self.ids)], len(self.centroids))
+        return self._lists.probe(self.centroids, query, nprobe)
+
+    def rows_where_in(self, field, values):
+        """Sorted rows whose metadata `field` is one of `values`."""
+        index = self._field_rows.get(field)
+        if index is None:
+            index = self._field_rows[field] = {}
+            for row, meta in enumerate(self.metadata):
+                index.setdefault(meta.get(field), []).append(row)
+        rows = [row for value in set(values) for row in index.get(value, ())]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def _arrays(self):
+        return [name for name in ("vectors", "scales", "full", "assign") if getattr(self, name) is not None]
+
+    def _writable(self, rows_needed, dimension):
+        if self.keep_full and (self.full is None or self.full.shape[0] < rows_needed):
+            capacity = 0 if self.full is None else self.full.shape[0]
+            self.full = _map_rows(self.full_path, _grown(capacity, rows_needed), dimension)
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if not (isinstance(self.vectors, np.memmap) or capacity < rows_needed):
+            return
+        # A reloaded namespace is copied into RAM at its size; only appends grow it
+        rows = capacity if capacity >= rows_needed else _grown(capacity, rows_needed)
+        shapes = {
+            "vectors": ((rows, dimension), np.float32 if self.precision == "float32" else np.dtype(self.precision)),
+            "scales": ((rows,), np.float32) if self.precision == "int8" else None,
+            "assign": ((rows,), np.int32) if self.assign is not None else None,
+        }
+        for name, shape in shapes.items():
+            if shape is None:
+                continue
+            grown = np.empty(*shape)
+            current = getattr(self, name)
+            if current is not None:
+                grown[: len(self.ids)] = current[: len(self.ids)]
+            setattr(self, name, grown)
+
+    def upsert(self, ids, vectors, metadata):
+        new_ids = [vector_id for vector_id in dict.fromkeys(ids) if vector_id not in self.rows]
+        self._writable(len(self.ids) + len(new_ids), vectors.shape[1])
+        for vector_id in new_ids:
+            self.rows[vector_id] = len(self.ids)
+            self.ids.append(vector_id)
+            self.metadata.append({})
+        rows = [self.rows[vector_id] for vector_id in ids]
+        codes, scales = _encode(vectors, self.precision)
+        self.vectors[rows] = codes
+        if scales is not None:
+            self.scales[rows] = scales
+        if self.full is not None:
+            self.full[rows] = vectors
+        if self.assign is not None:
+            self.assign[rows] = ann.assign_lists(vectors, self.centroids)
+            self._lists = None
+        for row, meta in zip(rows, metadata):
+            self.metadata[row] = meta
+        self._field_rows = {}
+        self.dirty = True
+
+    def delete(self, ids):
+        rows = sorted({self.rows[vector_id] for vector_id in ids if vector_id in self.rows}, reverse=True)
+        if not rows:
+            return
+        self._writable(len(self.ids), self.vectors.shape[1])
+        arrays = [getattr(self, name) for name in self._arrays()]
+        for row in rows:
+            # Swap-remove: move the last row into the hole.
+            last = len(self.ids) - 1
+            del self.rows[self.ids[row]]
+            if row != last:
+                for array in arrays:
+                    array[row] = array[last]
+                self.ids[row] = self.ids[last]
+                self.metadata[row] = self.metadata[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.metadata.pop()
+        self._lists = None
+        self._field_rows = {}
+        self.dirty = True
+
+
+class LocalIndex:
+    """In-process vector index with the subset of the Pinecone Index API we use.
+
+    Vectors are stored L2-normalised per namespace, so a matrix-vector
+    product gives cosine scores and `argpartition` picks the top k without a
+    full sort. With LOCAL_INDEX_PRECISION "float16" or "int8" the searched
+    matrix is compressed 2x or 4x; the best `LOCAL_INDEX_RERANK * top_k`
+    candidates are then re-scored against the float32 rows. Those rows are
+    only ever memory-mapped from `full.f32`, written in place on upsert and
+    paged in just for the re-ranked candidates, so RAM holds the compressed
+    codes alone; disk holds both, about 1.25x (int8) or 1.5x (float16) the
+    float32 footprint, unless LOCAL_INDEX_RERANK is 0. flush() persists each
+    changed namespace to `<path>/<namespace>/` (`vectors.npy`, `scales.npy`
+    for int8, and `meta.json`); on load those arrays are memory-mapped
+    read-only and the first write copies them into RAM.
+
+    Namespaces of `ann_min_vectors` rows or more are searched through an IVF
+    index (see ann.py) trained on flush, so queries score only the rows in
+    the `nprobe` nearest lists; new rows join their nearest list on upsert.
+    """
+
+    def __init__(self, path, precision=None, rerank=None, ann_min_vectors=None, nlist=None, nprobe=None):
+        self.path = path
+        self.precision = precision or LOCAL_INDEX_PRECISION
+        self.rerank = LOCAL_INDEX_RERANK if rerank is None else rerank
+        self.ann_min_vectors = LOCAL_INDEX_ANN_MIN_VECTORS if ann_min_vectors is None else ann_min_vectors
+        self.nlist = LOCAL_INDEX_NLIST if nlist is None else nlist
+        self.nprobe = LOCAL_INDEX_NPROBE if nprobe is None else nprobe
+        if self.precision not in _PRECISIONS:
+            raise ValueError(f"LOCAL_INDEX_PRECISION must be one of {_PRECISIONS}, got {self.precision!r}")
+        self._namespaces = {}
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        claim_directory(path)
+        atexit.register(self.flush)
+
+    def _dir(self, namespace):
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace or _DEFAULT_NAMESPACE)
+        return os.path.join(self.path, name)
+
+    def _namespace(self, namespace, create=False):
+        ns = self._namespaces.get(namespace)
+        if ns is not None:
+            return ns
+        directory = self._dir(namespace)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # Existing namespaces keep the precision they were written with
+            arrays = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in ("vectors", "scales", "centroids", "assign")
+                if os.path.exists(os.path.join(directory, f"{name}.npy"))
+            }
+            full_path = os.path.join(directory, "full.f32")
+            dimension = arrays["vectors"].shape[1]
+            legacy_path = os.path.join(directory, "full.npy")
+            if os.path.exists(legacy_path):
+                # Older namespaces saved the float32 rows as .npy; move them to the mapped file once
+                legacy = np.load(legacy_path, mmap_mode="r")
+                full = _map_rows(full_path, len(legacy), dimension)
+                for start in range(0, len(legacy), _SCORE_BLOCK_ROWS):
+                    full[start:start + _SCORE_BLOCK_ROWS] = legacy[start:start + _SCORE_BLOCK_ROWS]
+                full.flush()
+                del legacy
+                os.remove(legacy_path)
+            if os.path.exists(full_path) and os.path.getsize(full_path):
+                arrays["full"] = _map_rows(full_path, os.path.getsize(full_path) // (dimension * 4), dimension)
+            ns = _Namespace(meta["ids"], meta["metadata"], precision=meta.get("precision", "float32"),
+                            trained_count=meta.get("ann_trained_count", 0), full_path=full_path,
+                            keep_full=meta.get("keep_full", False), **arrays)
+        elif create:
+            ns = _Namespace(precision=self.precision, full_path=os.path.join(directory, "full.f32"),
+                            keep_full=self.precision != "float32" and self.rerank > 0)
+        else:
+            return None
+        self._namespaces[namespace] = ns
+        return ns
+
+    def _save(self, namespace, ns):
+        directory = self._dir(namespace)
+        os.makedirs(directory, exist_ok=True)
+        if ns.full is not None:
+            ns.full.flush()
+            if ns.full.shape[0] > len(ns):
+                # Give back the spare capacity; the next append grows the file again
+                dimension = ns.full.shape[1]
+                ns.full = None
+                with open(ns.full_path, "r+b") as f:
+                    f.truncate(len(ns) * dimension * 4)
+                if len(ns):
+                    ns.full = _map_rows(ns.full_path, len(ns), dimension)
+        for name in ("vectors", "scales", "centroids", "assign"):
+            path = os.path.join(directory, f"{name}.npy")
+            array = getattr(ns, name)
+            if array is not None:
+                # Write-then-rename: the old file may still back a memmap
+                with open(path + ".tmp", "wb") as f:
+                    np.save(f, np.ascontiguousarray(array if name == "centroids" else array[: len(ns)]))
+                os.replace(path + ".tmp", path)
+            elif os.path.exists(path):
+                os.remove(path)
+        tmp = os.path.join(directory, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"namespace": namespace, "precision": ns.precision, "ann_trained_count": ns.trained_count,
+                       "keep_full": ns.keep_full, "ids": ns.ids, "metadata": ns.metadata}, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+        ns.dirty = False
+
+    def upsert(self, vectors, namespace=""):
+        """Insert or overwrite `{"id", "values", "metadata"}` records."""
+        if not vectors:
+            return {"upserted_count": 0}
+        ids = [vector["id"] for vector in vectors]
+        matrix = _normalize(np.asarray([vector["values"] for vector in vectors], dtype=np.float32))
+        metadata = [dict(vector.get("metadata") or {}) for vector in vectors]
+        with self._lock:
+            ns = self._namespace(namespace, create=True)
+            ns.upsert(ids, matrix, metadata)
+        return {"upserted_count": len(ids)}
+
+    def query(self, vector, top_k, namespace="", filter=None, include_metadata=False, rerank=None, nprobe=None,
+              **kwargs):
+        """Return the `top_k` most similar records as a Pinecone-style response.
+
+        `rerank` overrides the index's re-rank factor for compressed
+        namespaces (0 returns the approximate scores without re-ranking);
+        `nprobe` overrides how many IVF lists are scanned (0 scans every row).
+        """
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns is None or not len(ns) or top_k <= 0:
+                return {"matches": [], "namespace": namespace}
+            query = np.asarray(vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            ns.maybe_train(self.ann_min_vectors, self.nlist)
+            if _is_in_filter(filter):
+                # e.g. a lexical prefilter: score just the matching rows, exactly
+                (field, condition), = filter.items()
+                rows, filter = ns.rows_where_in(field, condition["$in"]), None
+            else:
+                rows = ns.probe(query, self.nprobe if nprobe is None else nprobe)
+            scores = ns.scores(query, rows)
+            eligible = len(scores)
+            if filter:
+                metadata = ns.metadata if rows is None else [ns.metadata[row] for row in rows.tolist()]
+                mask = np.fromiter((_matches_filter(meta, filter) for meta in metadata),
+                                   dtype=bool, count=len(scores))
+                scores = np.where(mask, scores, -np.inf)
+                eligible = int(mask.sum())
+            top_k = min(top_k, eligible)
+            if top_k <= 0:
+                return {"matches": [], "namespace": namespace}
+
+            # Positions into `scores`, then the namespace rows they stand for
+            rerank = self.rerank if rerank is None else rerank
+            candidates = min(eligible, top_k * rerank) if ns.full is not None and rerank > 0 else top_k
+            if candidates < len(scores):
+                top = np.argpartition(-scores, candidates - 1)[:candidates]
+            else:
+                top = np.arange(len(scores))
+            picked = top if rows is None else rows[top]
+            picked_scores = scores[top]
+            if candidates > top_k:
+                # Exact re-rank: only these rows of the float32 matrix are read
+                order = np.argsort(picked)
+                picked, picked_scores = picked[order], ns.full[picked[order]] @ query
+                best = np.argpartition(-picked_scores, top_k - 1)[:top_k]
+                picked, picked_scores = picked[best], picked_scores[best]
+            order = np.argsort(-picked_scores, kind="stable")
+            matches = []
+            for row, score in zip(picked[order].tolist(), picked_scores[order].tolist()):
+                match = {"id": ns.ids[row], "score": float(score)}
+                if include_metadata:
+                    match["metadata"] = dict(ns.metadata[row])
+                matches.append(match)
+            return {"matches": matches, "namespace": namespace}
+
+    def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+        """Delete records by id, or the whole namespace with `delete_all`."""
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                shutil.rmtree(self._dir(namespace), ignore_errors=True)
+                return {}
+            ns = self._namespace(namespace)
+            if ns is not None and ids:
+                ns.delete(ids)
+                self._save(namespace, ns)
+            return {}
+
+    def flush(self):
+        """Write namespaces changed since the last flush to disk."""
+        with self._lock:
+            for namespace, ns in self._namespaces.items():
+                if ns.dirty:
+                    ns.maybe_train(self.ann_min_vectors, self.nlist)
+                    self._save(namespace, ns)
+
+    def fetch_namespace(self, namespace=""):
+        """Return (ids, metadata, float32 vectors) for every record in `namespace`."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns is None:
+                return [], [], np.empty((0, 0), dtype=np.float32)
+            return list(ns.ids), [dict(meta) for meta in ns.metadata], ns.decoded()
+
+    def describe_index_stats(self, **kwargs):
+        """Vector counts per namespace; ones not loaded are counted from their meta.json, not loaded."""
+        with self._lock:
+            namespaces = {namespace: {"vector_count": len(ns)} for namespace, ns in self._namespaces.items()}
+            dimension = next((ns.vectors.shape[1] for ns in self._namespaces.values() if ns.vectors is not None), None)
+            loaded = {os.path.basename(self._dir(namespace)) for namespace in self._namespaces}
+            for name in os.listdir(self.path):
+                meta_path = os.path.join(self.path, name, "meta.json")
+                if name in loaded or not os.path.exists(meta_path):
+                    continue
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                namespaces[meta.get("namespace", "")] = {"vector_count": len(meta["ids"])}
+                vectors_path = os.path.join(self.path, name, "vectors.npy")
+                if dimension is None and os.path.exists(vectors_path):
+                    dimension = np.load(vectors_path, mmap_mode="r").shape[1]
+            return {
+                "dimension": dimension,
+                "namespaces": namespaces,
+                "total_vector_count": sum(stats["vector_count"] for stats in namespaces.values()),
+            }
+
+
+def _vector_bytes(vector):
+    # JSON-encoded floats run to roughly 20 bytes each.
+    return len(vector["id"]) + 20 * len(vector["values"]) + len(json.dumps(vector.get("metadata") or {}))
+
+
+def _iter_sized_batches(vectors, max_vectors=UPSERT_BATCH_VECTORS, max_bytes=UPSERT_BATCH_BYTES):
+    """Group vectors into (batch, estimated bytes) pairs bounded by count and request size."""
+    batch, size = [], 0
+    for vector in vectors:
+        vector_size = _vector_bytes(vector)
+        if batch and (len(batch) >= max_vectors or size + vector_size > max_bytes):
+            yield batch, size
+            batch, size = [], 0
+        batch.append(vector)
+        size += vector_size
+    if batch:
+        yield batch, size
+
+
+def _upsert_with_retry(index, batch, namespace, retries, size=0):
+    for attempt in range(retries + 1):
+        try:
+            index.upsert(vectors=batch, namespace=namespace)
+            metrics.inc("resume_upserted_vectors_total", len(batch), help="Vectors acknowledged by the index.")
+            metrics.inc("resume_upserted_bytes_total", size, help="Estimated request bytes upserted.")
+            return len(batch)
+        except Exception:
+            metrics.inc("resume_upsert_failures_total", help="Failed upsert attempts, including retried ones.")
+            if attempt == retries:
+                raise
+            # Exponential backoff with jitter: ~0.5s, 1s, 2s, ...
+            time.sleep(0.5 * 2 ** attempt * (0.5 + random.random()))
+
+
+def upsert_in_batches(index, vectors, namespace="", max_workers=UPSERT_WORKERS, retries=UPSERT_RETRIES,
+                      on_batch=None, flush=True, **batch_limits):
+    """Upsert `vectors` (any iterable) in size-bounded batches over a thread pool.
+
+    At most `2 * max_workers` batches are in flight, so a generator input is
+    consumed no faster than the index accepts it. Each failed batch is retried
+    with backoff; `on_batch(count)` is called as each batch is acknowledged.
+    A local index is flushed to disk at the end unless `flush` is False, for
+    callers that upsert many times and flush once. Returns the number of
+    vectors upserted.
+    """
+    total = 0
+    in_flight = set()
+
+    def drain(return_when):
+        nonlocal in_flight, total
+        done, in_flight = wait(in_flight, return_when=return_when)
+        for future in done:
+            count = future.result()
+            total += count
+            if on_batch is not None:
+                on_batch(count)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upsert") as executor:
+        for batch, size in _iter_sized_batches(vectors, **batch_limits):
+            if len(in_flight) >= 2 * max_workers:
+                drain(FIRST_COMPLETED)
+            in_flight.add(executor.submit(_upsert_with_retry, index, batch, namespace, retries, size))
+        drain(ALL_COMPLETED)
+
+    if flush and hasattr(index, "flush"):
+        index.flush()
+    return total
+
+
+def fetch_namespace(index, namespace, batch_size=100):
+    """Return (ids, metadata, float32 matrix) for every vector in a namespace.
+
+    Uses LocalIndex.fetch_namespace directly; for Pinecone, pages through
+    `list` and `fetch`.
+    """
+    fetch_local = getattr(index, "fetch_namespace", None)
+    if fetch_local is not None:
+        return fetch_local(namespace)
+    ids = [vector_id for page in index.list(namespace=namespace) for vector_id in page]
+    metadata, rows = [], []
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        fetched = index.fetch(ids=batch, namespace=namespace).vectors
+        for vector_id in batch:
+            rows.append(fetched[vector_id].values)
+            metadata.append(dict(fetched[vector_id].metadata or {}))
+    if not rows:
+        return [], [], np.empty((0, 0), dtype=np.float32)
+    return ids, metadata, np.asarray(rows, dtype=np.float32)